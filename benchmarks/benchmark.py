@@ -0,0 +1,202 @@
+"""
+Benchmark braininventory on synthetic inventories.
+
+For each inventory size, a synthetic "today.json" is generated and the loading,
+reporting, similarity, date rollup and plotting functions are timed on it. The results
+are printed and written as JSON, one record per benchmark and size, so they can be
+compared across commits.
+
+Example:
+    python benchmarks/benchmark.py --rows 10000 1000000 --output results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from braininventory import get
+from synthetic import write_inventory
+
+
+def __benchmarks(directory, cache_directory, similar_columns):
+    """
+    Get the benchmarks as (name, function) pairs. Each function takes the inventory
+    loaded by the cold-load benchmark. Figures are rendered without the plot cache, so
+    every run draws them.
+    """
+    report_metrics = [name for name in get.METRICS if name != "projects_treemap"]
+
+    def load(**options):
+        return lambda df: get.today(
+            directory=directory, cache_directory=cache_directory, **options
+        )
+
+    benchmarks = [
+        ("today.cold", load(cache=False)),
+        ("today.warm", load()),
+        ("today.columns", load(columns=["score", "json_file"])),
+        ("today.lazy", load(lazy=True)),
+        ("report", lambda df: get.Report(df).compute(report_metrics)),
+        (
+            "report.lazy",
+            lambda df: get.Report(load(lazy=True)(df)).compute(report_metrics),
+        ),
+        ("dates", lambda df: get.__get_dates(df.copy())),
+        (
+            "plot.general_modality_by_year",
+            lambda df: get.create_general_modality_plot(df.copy()),
+        ),
+        (
+            "plot.projects_treemap",
+            lambda df: get.create_projects_treemap(
+                get.__count_values(df["project"]), cache=False
+            ),
+        ),
+        ("plot.general_modality", lambda df: get.__create_general_modality_plot(df)),
+        (
+            "plot.general_modality_treemap",
+            lambda df: get.__create_general_modality_treemap(df),
+        ),
+        ("plot.all", lambda df: get.render_figures(df, cache=False)),
+    ]
+    for column in similar_columns:
+        benchmarks.append(
+            (
+                f"similar_columns.{column}",
+                lambda df, column=column: get.__get_similar_columns(df, column),
+            )
+        )
+    return benchmarks
+
+
+def run(
+    rows,
+    repeat=3,
+    similar_columns=("affiliation", "contributorname", "technique"),
+    only=None,
+):
+    """
+    Run the benchmarks on synthetic inventories.
+
+    Parameters:
+    -----------
+    rows : list of int
+        The sizes of the inventories.
+    repeat : int
+        The number of times each benchmark runs. The fastest run is reported.
+    similar_columns : list
+        The columns `__get_similar_columns` is timed on.
+    only : list or None
+        The names of the benchmarks to run, or None to run all of them.
+
+    Returns:
+    --------
+    list of dict
+        One record per benchmark and size with the fastest wall and CPU times, the peak
+        resident set size of the process so far and how much the benchmark raised it,
+        and whether the benchmark succeeded.
+    """
+    import matplotlib.pyplot as plt
+
+    results = []
+    for size in rows:
+        with tempfile.TemporaryDirectory() as workspace:
+            workspace = Path(workspace)
+            cache_directory = workspace / "cache"
+            started = time.perf_counter()
+            write_inventory(workspace / get.INVENTORY_FILENAME, size)
+            print(f"Generated {size} rows in {time.perf_counter() - started:.1f}s")
+
+            # plots are saved in the working directory
+            cwd = os.getcwd()
+            os.chdir(workspace)
+            try:
+                df = get.today(directory=workspace, cache=False)
+                # fill the cache so the warm and lazy loads read the snapshot
+                get.today(directory=workspace, cache_directory=cache_directory)
+                for name, function in __benchmarks(
+                    workspace, cache_directory, similar_columns
+                ):
+                    if only and name not in only:
+                        continue
+
+                    timings = []
+                    error = None
+                    for _ in range(repeat):
+                        try:
+                            with get.measure(name, timings):
+                                function(df)
+                        except Exception as exception:
+                            error = f"{type(exception).__name__}: {exception}"
+                            break
+                        finally:
+                            plt.close("all")
+
+                    fastest = min(
+                        timings,
+                        key=lambda timing: timing["wall_seconds"],
+                        default={},
+                    )
+                    result = {
+                        "benchmark": name,
+                        "rows": size,
+                        "wall_seconds": fastest.get("wall_seconds"),
+                        "cpu_seconds": fastest.get("cpu_seconds"),
+                        "max_rss_bytes": fastest.get("max_rss_bytes"),
+                        "rss_growth_bytes": fastest.get("rss_growth_bytes"),
+                        "runs": len(timings),
+                        "error": error,
+                    }
+                    results.append(result)
+                    status = error or f"{result['wall_seconds']:.4f}s"
+                    print(f"{name:35} {size:>10} {status}")
+            finally:
+                os.chdir(cwd)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--rows",
+        type=int,
+        nargs="+",
+        default=[10000, 1000000],
+        help="inventory sizes, e.g. 10000 1000000 10000000",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--similar-columns",
+        nargs="*",
+        default=["affiliation", "contributorname", "technique"],
+        help="columns to time __get_similar_columns on",
+    )
+    parser.add_argument("--only", nargs="*", help="names of the benchmarks to run")
+    parser.add_argument("--output", type=Path, help="file to write the results to")
+    arguments = parser.parse_args()
+
+    results = run(
+        arguments.rows, arguments.repeat, arguments.similar_columns, arguments.only
+    )
+    document = {
+        "created": pd.Timestamp.now(tz="UTC").isoformat(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if arguments.output:
+        arguments.output.write_text(json.dumps(document, indent=2))
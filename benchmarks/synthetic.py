@@ -0,0 +1,208 @@
+"""
+Generate synthetic Brain Image Library inventories for benchmarking.
+
+The generated inventories have the same columns as "today.json" and value
+distributions shaped like the real ones: a few projects, affiliations and modalities
+account for most datasets (Zipf-distributed), some affiliations and contributors
+appear under several spellings, and identifiers such as "samplelocalid", "json_file"
+and "URL" are nearly unique.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MODALITIES = [
+    "confocal microscopy",
+    "light sheet microscopy",
+    "two-photon microscopy",
+    "fluorescence micro-optical sectioning tomography",
+    "serial two-photon tomography",
+    "MRI",
+    "electron microscopy",
+    "spatial transcriptomics",
+    "multimodal",
+    "other",
+]
+
+SPECIES = [
+    ("mouse", "10090"),
+    ("human", "9606"),
+    ("marmoset", "9483"),
+    ("macaque", "9544"),
+    ("rat", "10116"),
+    ("zebrafish", "7955"),
+    ("fly", "7227"),
+    ("pig", "9823"),
+]
+
+TECHNIQUES = [
+    "smFISH",
+    "MERFISH",
+    "anterograde tracing",
+    "retrograde tracing",
+    "cell morphology",
+    "connectivity",
+    "MORF genetic sparse labeling",
+    "whole brain imaging",
+    "expansion microscopy",
+    "tissue clearing",
+]
+
+LOCATIONS = [
+    "Pittsburgh, PA",
+    "Seattle, WA",
+    "Los Angeles, CA",
+    "Cold Spring Harbor, NY",
+    "Baltimore, MD",
+    "Cambridge, MA",
+    "Wuhan, China",
+    "Ashburn, VA",
+    "Berkeley, CA",
+    "Stanford, CA",
+]
+
+CREATION_DATE_FORMAT = "%a %b %d %H:%M:%S %Y"
+
+
+def __zipf(random, cardinality, size, exponent=1.2):
+    """
+    Draw `size` indices in [0, cardinality) with Zipf-distributed frequencies.
+    """
+    weights = 1.0 / np.arange(1, cardinality + 1) ** exponent
+    return random.choice(cardinality, size=size, p=weights / weights.sum())
+
+
+def __with_variants(names, random, share=0.05):
+    """
+    Add misspelled variants of a few names, such as trailing spaces or acronyms.
+    """
+    variants = list(names)
+    for name in names:
+        if random.random() < share * 4:
+            variants.append(f"{name} ")
+        if random.random() < share:
+            initials = "".join(word[0] for word in name.split() if word[0].isupper())
+            variants.append(f"{name} ({initials})")
+    return variants
+
+
+def synthetic_inventory(rows, seed=0, start=0):
+    """
+    Generate a synthetic inventory.
+
+    Parameters:
+    -----------
+    rows : int
+        The number of datasets.
+    seed : int
+        The seed of the random number generator. The same seed, `rows` and `start`
+        always produce the same inventory.
+    start : int
+        The index of the first dataset, used to generate large inventories in chunks
+        with unique identifiers.
+
+    Returns:
+    --------
+    pandas DataFrame
+        An inventory with one row per dataset.
+    """
+    # the vocabularies only depend on the seed, so chunks share them
+    vocabulary = np.random.default_rng(seed)
+    projects = [f"Project {index:03d}" for index in range(120)]
+    affiliations = __with_variants(
+        [f"University of Example {index}" for index in range(60)]
+        + ["Allen Institute for Brain Science", "Cold Spring Harbor Laboratory"],
+        vocabulary,
+    )
+    contributors = __with_variants(
+        [f"Contributor {index} Lastname" for index in range(600)], vocabulary
+    )
+    genotypes = [f"Cre-line-{index}" for index in range(250)]
+    awards = [f"1U01MH{114000 + index}" for index in range(150)]
+
+    random = np.random.default_rng([seed, start])
+    species = __zipf(random, len(SPECIES), rows, exponent=2.0)
+    index = np.arange(start, start + rows)
+    paths = [f"/bil/data/{value % 256:02x}/{value:08x}" for value in index]
+
+    created = pd.Timestamp("2019-01-01") + pd.to_timedelta(
+        random.integers(0, 5 * 365 * 86400, size=rows), unit="s"
+    )
+    genotype = np.array(genotypes, dtype=object)[__zipf(random, len(genotypes), rows)]
+    genotype[random.random(rows) < 0.3] = None
+
+    return pd.DataFrame(
+        {
+            "project": np.array(projects)[__zipf(random, len(projects), rows)],
+            "affiliation": np.array(affiliations)[
+                __zipf(random, len(affiliations), rows)
+            ],
+            "contributorname": np.array(contributors)[
+                __zipf(random, len(contributors), rows)
+            ],
+            "award_number": np.array(awards)[__zipf(random, len(awards), rows)],
+            "generalmodality": np.array(MODALITIES)[
+                __zipf(random, len(MODALITIES), rows, exponent=1.5)
+            ],
+            "species": np.array([name for name, taxonomy in SPECIES])[species],
+            "ncbitaxonomy": np.array([taxonomy for name, taxonomy in SPECIES])[species],
+            "technique": np.array(TECHNIQUES)[__zipf(random, len(TECHNIQUES), rows)],
+            "locations": np.array(LOCATIONS)[__zipf(random, len(LOCATIONS), rows)],
+            "genotype": genotype,
+            "samplelocalid": [f"sample-{value // 4}" for value in index],
+            "metadata_version": random.choice([1, 2], size=rows, p=[0.7, 0.3]),
+            "size": random.lognormal(mean=20, sigma=3, size=rows).astype("int64"),
+            "score": random.choice([0.0, 0.25, 0.5, 0.75, 1.0], size=rows),
+            "md5_coverage": random.random(rows).round(4),
+            "sha256_coverage": random.random(rows).round(4),
+            "json_file": [f"{path}/metadata.json" for path in paths],
+            "URL": [
+                path.replace("/bil/data", "https://download.brainimagelibrary.org", 1)
+                for path in paths
+            ],
+            "creation_date": created.strftime(CREATION_DATE_FORMAT),
+        }
+    )
+
+
+def write_inventory(filename, rows, seed=0, chunksize=500000):
+    """
+    Write a synthetic inventory as a JSON array of records, like "today.json".
+
+    Parameters:
+    -----------
+    filename : str or pathlib.Path
+        The file to write.
+    rows : int
+        The number of datasets.
+    seed : int
+        The seed of the random number generator.
+    chunksize : int
+        The number of datasets generated and written at a time, which bounds the memory
+        used for large inventories.
+    """
+    with open(filename, "w", encoding="utf-8") as file:
+        file.write("[")
+        for start in range(0, rows, chunksize):
+            chunk = synthetic_inventory(min(chunksize, rows - start), seed, start)
+            records = chunk.to_json(orient="records")
+            if start:
+                file.write(",")
+            file.write(records[1:-1])
+        file.write("]")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("filename", type=Path)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+
+    write_inventory(arguments.filename, arguments.rows, arguments.seed)
+    print(json.dumps({"filename": str(arguments.filename), "rows": arguments.rows}))
@@ -1,24 +1,284 @@
+import asyncio
 import calendar
+import codecs
+import hashlib
+import importlib.util
 import json
+import os
 import random
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
+import zlib
+from collections import Counter, defaultdict
 from datetime import date
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from difflib import SequenceMatcher
+from functools import partial
 from pathlib import Path
+from statistics import NormalDist
+from urllib.parse import urlsplit
 
-import folium
-import geoip2.database
 import humanize
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import requests
-import seaborn as sb
-import squarify
-from geopy.geocoders import Nominatim
-from pandarallel import pandarallel
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+INVENTORY_DIRECTORY = "/bil/data/inventory/daily/reports/"
+INVENTORY_SERVER = "https://download.brainimagelibrary.org/inventory/daily/reports/"
+INVENTORY_FILENAME = "today.json"
+
+# suffix of the compressed variants of the inventory
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+# seconds the server may take to accept a connection or send the next piece of the
+# inventory
+INVENTORY_TIMEOUT = 60
+
+# number of characters read from the source at a time while streaming
+READ_SIZE = 1 << 20
+
+# number of records turned into a DataFrame at a time while streaming
+CHUNK_SIZE = 50000
+
+# directory holding the cached inventory snapshots
+CACHE_DIRECTORY = os.environ.get(
+    "BRAININVENTORY_CACHE", str(Path.home() / ".cache" / "braininventory")
+)
+
+# maximum total size of the cached inventory snapshots
+CACHE_MAX_BYTES = 2 * 1024**3
+
+# backends of parallel_map() and their default number of workers, which is the number of
+# processors this process may run on unless BRAININVENTORY_MAX_WORKERS is set
+EXECUTOR_BACKENDS = ("serial", "threads", "processes")
+MAX_WORKERS = int(os.environ.get("BRAININVENTORY_MAX_WORKERS", 0)) or (
+    len(os.sched_getaffinity(0))
+    if hasattr(os, "sched_getaffinity")
+    else os.cpu_count() or 1
+)
+
+# columns with few distinct values, loaded as categoricals
+CATEGORICAL_COLUMNS = [
+    "generalmodality",
+    "species",
+    "ncbitaxonomy",
+    "affiliation",
+    "contributorname",
+    "award_number",
+    "project",
+    "technique",
+    "metadata_version",
+    "locations",
+    "genotype",
+]
+
+# numeric columns and the dtypes they are loaded as
+NUMERIC_COLUMNS = {
+    "size": "int64",
+    "score": "float32",
+    "md5_coverage": "float32",
+    "sha256_coverage": "float32",
+}
+
+# columns whose values are counted for the report
+REPORT_COUNTED_COLUMNS = [
+    "project",
+    "metadata_version",
+    "contributorname",
+    "affiliation",
+    "award_number",
+    "species",
+    "ncbitaxonomy",
+    "samplelocalid",
+    "genotype",
+    "generalmodality",
+    "technique",
+    "locations",
+]
+
+# numeric columns summarized for the report
+REPORT_NUMERIC_COLUMNS = ["score", "size", "md5_coverage", "sha256_coverage"]
+
+# canonical names of known variants of the values of some columns, see canonicalize()
+CANONICAL_NAMES = {
+    "affiliation": {
+        "Allen Institute for Brain Science ": "Allen Institute for Brain Science",
+        "University of California, Los Angeles (UCLA)": (
+            "University of California, Los Angeles"
+        ),
+    },
+}
+
+# format of the "creation_date" column, e.g. "Mon Jul 24 13:05:01 2023"
+CREATION_DATE_FORMAT = "%a %b %d %H:%M:%S %Y"
+
+# number of each abbreviated month name
+MONTHS = {month: index for index, month in enumerate(calendar.month_abbr) if month}
+
+# metrics of the report, see register_metric()
+METRICS = {}
+
+# maximum number of reachability requests in flight, overall and per host
+REACHABILITY_CONCURRENCY = 200
+REACHABILITY_PER_HOST = 50
+
+# seconds a reachability request may take, and number of times it is retried
+REACHABILITY_TIMEOUT = 30
+REACHABILITY_RETRIES = 2
+
+# prefix of the dataset paths and the server they are downloaded from
+DATA_DIRECTORY = "/bil/data"
+DATA_SERVER = "https://download.brainimagelibrary.org"
+
+# maximum number of metadata files downloaded at a time
+METADATA_CONCURRENCY = 16
+
+# maximum total size of the cached metadata files
+METADATA_CACHE_MAX_BYTES = 512 * 1024**2
+
+# file in the cache directory holding the reachability results and their history
+REACHABILITY_DATABASE = "reachability.sqlite"
+
+# seconds after which a cached reachability result is checked again
+REACHABILITY_TTL = 7 * 24 * 3600
+
+# columns whose changes cause a cached reachability result to be checked again
+REACHABILITY_FINGERPRINT_COLUMNS = ["URL", "size", "creation_date"]
+
+# version of the rendered figures, part of the keys of the plot cache, bumped whenever
+# the rendering code changes
+PLOT_CACHE_VERSION = 1
+
+# maximum total size of the cached figures
+PLOT_CACHE_MAX_BYTES = 256 * 1024**2
+
+GEOCODING_DATABASE = "geocoding.sqlite"
+GEOCODING_USER_AGENT = "braininventory"
+
+# minimum number of seconds between two geocoding requests, as required by the usage
+# policy of Nominatim
+GEOCODING_DELAY = 1.0
+
+__JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# date keys of the inventories, see `date_keys()`, by the id of the inventory: a weak
+# reference to the inventory, its index, the storage of its creation dates and the keys
+__DATE_KEYS = {}
+
+
+def parallel_map(function, items, backend="threads", max_workers=None):
+    """
+    Apply a function to every item, serially, on a thread pool or on a process pool.
+
+    Threads suit I/O-bound work, such as downloads, and processes CPU-bound work, such
+    as string comparisons. With processes, the function and the items are pickled, so
+    the function must be defined at the top level of a module, and the items should be
+    small, e.g. chunks of a column rather than the whole DataFrame, see `map_chunks()`.
+
+    Parameters:
+    -----------
+    function : callable
+        The function to apply.
+    items : iterable
+        The items to apply it to.
+    backend : str
+        "serial", "threads" or "processes".
+    max_workers : int or None
+        The number of threads or processes. Defaults to MAX_WORKERS.
+
+    Returns:
+    --------
+    list
+        The results, in the order of the items.
+    """
+    if backend not in EXECUTOR_BACKENDS:
+        raise ValueError(f"Error: Unsupported backend {backend}")
+
+    items = list(items)
+    max_workers = min(max_workers or MAX_WORKERS, max(len(items), 1))
+    if backend == "serial" or max_workers == 1:
+        return [function(item) for item in items]
+
+    pool = ThreadPoolExecutor if backend == "threads" else ProcessPoolExecutor
+    with pool(max_workers=max_workers) as executor:
+        return list(executor.map(function, items))
+
+
+def map_chunks(function, data, backend="processes", max_workers=None, chunks=None):
+    """
+    Apply a function to consecutive chunks of a Series, DataFrame, array or list and
+    concatenate the results.
+
+    Only the chunks are sent to the workers, so this is how row-wise work on a column,
+    such as a row-wise `apply`, runs on a process pool without pickling the DataFrame.
 
-pandarallel.initialize(nb_workers=8, progress_bar=True)
-import matplotlib.pyplot as plt
-import squarify
+    Parameters:
+    -----------
+    function : callable
+        The function to apply to each chunk. It returns a Series or DataFrame if `data`
+        is one, and a list otherwise.
+    data : pandas Series, pandas DataFrame, numpy array or list
+        The data to split. Select the columns the function needs first.
+    backend : str
+        "serial", "threads" or "processes", see `parallel_map()`.
+    max_workers : int or None
+        The number of threads or processes. Defaults to MAX_WORKERS.
+    chunks : int or None
+        The number of chunks. Defaults to four per worker, to balance the load.
+
+    Returns:
+    --------
+    pandas Series, pandas DataFrame or list
+        The concatenated results.
+    """
+    max_workers = max_workers or MAX_WORKERS
+    if backend == "serial" or max_workers == 1:
+        chunks = 1
+    chunks = chunks or 4 * max_workers
+    bounds = np.linspace(0, len(data), min(chunks, len(data)) + 1).astype(int)
+    pandas = isinstance(data, (pd.Series, pd.DataFrame))
+    parts = [
+        data.iloc[start:stop] if pandas else data[start:stop]
+        for start, stop in zip(bounds[:-1], bounds[1:])
+    ]
+
+    results = parallel_map(function, parts, backend, max_workers)
+    if pandas:
+        return pd.concat(results) if results else data.iloc[:0]
+    return [result for part in results for result in part]
+
+
+def __count_values(series):
+    """
+    Count the occurrences of each unique value in a Series.
+
+    Parameters:
+    -----------
+    series : pandas Series
+        The values to count. Categorical Series are counted on their integer codes.
+
+    Returns:
+    --------
+    pandas Series
+        The number of occurrences of each value, in descending order. Categories that
+        do not occur in `series` are left out.
+    """
+    counts = series.value_counts()
+    return counts[counts > 0]
 
 
 def __get_number_of_species(df):
@@ -90,27 +350,13 @@ def __create_general_modality_plot(df):
         df (pandas.DataFrame): The input DataFrame containing the 'generalmodality' column.
 
     Returns:
-        None: The function generates a bar plot but does not return any value. The plot is saved as an
-            image file with a filename in the format 'general-modality-YYYYMMDD.png', where 'YYYYMMDD'
-            represents the current date in year-month-day format.
+        str: The name of the file the plot is saved as, in the format 'general-modality-YYYYMMDD.png',
+            where 'YYYYMMDD' represents the current date in year-month-day format.
     """
 
-    modality_counts = df["generalmodality"].value_counts()
-
-    plt.figure(figsize=(10, 6))
-    color = plt.cm.tab20c.colors
-
-    ax = modality_counts.plot(kind="bar", color=color, edgecolor="black")
-    plt.xlabel("General Modality", fontsize=12)
-    plt.ylabel("Frequency", fontsize=12)
-    plt.title("Frequency of General Modality", fontsize=14)
-    plt.xticks(rotation=45, ha="right", fontsize=10)
-    plt.yticks(fontsize=10)
-
-    plt.tight_layout()
-
-    filename = f'general-modality-{datetime.now().strftime("%Y%m%d")}.png'
-    plt.savefig(filename)
+    filename = f'general-modality-{date.today().strftime("%Y%m%d")}.png'
+    __render_modality_bar(__count_values(df["generalmodality"]), [filename])
+    return filename
 
 
 def get_random_sample(df):
@@ -118,10 +364,9 @@ def get_random_sample(df):
     Retrieve a random JSON file from the DataFrame.
 
     This function takes a pandas DataFrame as input and filters it to keep only the rows that have
-    a non-zero 'score' value. From the filtered rows, it selects a random row using the 'random.randint()'
-    function. It then generates a valid link to the JSON file by replacing '/bil/data' with
-    'https://download.brainimagelibrary.org' in the 'json_file' column of the selected row. The function
-    performs an HTTP GET request to download the JSON file from the generated link, and it returns the
+    a non-zero 'score' value. From the filtered rows, it selects a random row using the 'random.randrange()'
+    function. It then downloads the JSON file of the selected row with `fetch_metadata`, which replaces
+    '/bil/data' with 'https://download.brainimagelibrary.org' in the 'json_file' column, and it returns the
     JSON data as a Python dictionary.
 
     Parameters:
@@ -131,16 +376,220 @@ def get_random_sample(df):
         dict: A Python dictionary containing the JSON data retrieved from a random row's JSON file.
     """
 
+    df = df[["score", "json_file"]]  # only materialize the columns that are used
     isNotZero = df[df["score"] != 0.0]  # only have files with the correct data
     randomRow = isNotZero.iloc[
-        random.randint(0, len(isNotZero))
+        random.randrange(len(isNotZero))
     ]  # select a random row of random index
-    jsonFileLink = randomRow.json_file.replace(
-        "/bil/data", "https://download.brainimagelibrary.org", 1
-    )  # create the link
-    result = requests.get(jsonFileLink)
+    return fetch_metadata([randomRow.json_file])[randomRow.json_file]
+
+
+def __metadata_url(json_file):
+    """
+    Get the URL a metadata file is downloaded from.
+    """
+    return json_file.replace(DATA_DIRECTORY, DATA_SERVER, 1)
+
+
+def resolve_data_path(path):
+    """
+    Resolve the path of a dataset file, such as a "json_file", to where it can be read from.
+
+    Parameters:
+    -----------
+    path : str
+        The path of the file under DATA_DIRECTORY, e.g. "/bil/data/.../metadata.json".
+
+    Returns:
+    --------
+    pathlib.Path or str
+        The path itself if it exists on this machine, e.g. on a node where DATA_DIRECTORY is
+        mounted, or else the URL it is downloaded from.
+    """
+    local = Path(path)
+    if local.is_file():
+        return local
+    return __metadata_url(path)
+
+
+def __read_local_json(path):
+    """
+    Parse a local JSON file.
+    """
+    with open(path, "rb") as file:
+        return json.load(file)
+
+
+def __metadata_cache_path(cache_directory, json_file):
+    """
+    Get the file caching a metadata file, named after the SHA-1 digest of its path.
+    """
+    digest = hashlib.sha1(json_file.encode("utf-8")).hexdigest()
+    return Path(cache_directory) / "metadata" / digest[:2] / f"{digest}.json"
+
+
+def __metadata_session(pool_size):
+    """
+    Create a session whose pool keeps up to `pool_size` connections alive, retrying
+    failed connections and server errors.
+    """
+    retry = Retry(
+        total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504)
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def __fetch_metadata(session, json_file, cache_directory, timeout, local=True):
+    """
+    Get a parsed metadata file from the local filesystem or the cache, or download it and
+    cache it.
+    """
+    location = resolve_data_path(json_file) if local else __metadata_url(json_file)
+    if isinstance(location, Path):
+        return __read_local_json(location)
+
+    cached = None
+    if cache_directory is not None:
+        cached = __metadata_cache_path(cache_directory, json_file)
+        if cached.exists():
+            with open(cached, "rb") as file:
+                document = json.load(file)
+            os.utime(cached)
+            return document
+
+    response = session.get(location, timeout=timeout)
+    response.raise_for_status()
+    document = response.json()
+
+    if cached is not None:
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        temporary = cached.with_name(f"{cached.name}.{os.getpid()}.partial")
+        temporary.write_bytes(response.content)
+        os.replace(temporary, cached)
+    return document
+
+
+def fetch_metadata(
+    json_files,
+    max_workers=METADATA_CONCURRENCY,
+    cache=True,
+    cache_directory=None,
+    timeout=30,
+    local=True,
+    backend="threads",
+    cache_max_bytes=METADATA_CACHE_MAX_BYTES,
+):
+    """
+    Download many metadata JSON files concurrently.
+
+    The files are downloaded by a pool of threads sharing a session, so connections are
+    kept alive and reused. Downloaded files are cached on disk and read from the cache on
+    later calls, until the least recently used are evicted once the cache exceeds
+    `cache_max_bytes`. Files that exist on this machine are read directly, see
+    `resolve_data_path`.
+
+    Parameters:
+    -----------
+    json_files : iterable of str
+        The paths of the metadata files, as in the "json_file" column, e.g.
+        "/bil/data/.../metadata.json".
+    max_workers : int
+        The maximum number of files downloaded at a time.
+    cache : bool
+        If True, read and write the files in the cache directory.
+    cache_directory : str or None
+        The directory holding the cached files. Defaults to CACHE_DIRECTORY.
+    timeout : float
+        The number of seconds a download may take.
+    local : bool
+        If False, download the files even if they exist on this machine.
+    backend : str
+        "threads" or "serial", see `parallel_map()`.
+    cache_max_bytes : int
+        The maximum total size of the cached files. The least recently used files are
+        removed once it is exceeded.
+
+    Returns:
+    --------
+    dict
+        The parsed JSON data of each unique path, or None if it could not be downloaded.
+    """
+    json_files = list(dict.fromkeys(json_files))
+    if cache:
+        cache_directory = cache_directory or CACHE_DIRECTORY
+    else:
+        cache_directory = None
+
+    def fetch(json_file):
+        try:
+            return __fetch_metadata(session, json_file, cache_directory, timeout, local)
+        except (requests.RequestException, OSError, ValueError) as error:
+            print(f"Warning: Unable to retrieve {json_file}: {error}")
+            return None
+
+    if backend not in ("threads", "serial"):
+        raise ValueError(f"Error: Unsupported backend {backend}")
+
+    with __metadata_session(max_workers) as session:
+        documents = parallel_map(fetch, json_files, backend, max_workers)
+    if cache_directory is not None:
+        metadata = Path(cache_directory) / "metadata"
+        __evict_files(metadata.glob("*/*.json"), cache_max_bytes)
+    return dict(zip(json_files, documents))
+
+
+def get_random_samples(df, n, where=None, seed=None, as_frame=False, **options):
+    """
+    Retrieve the JSON files of random datasets.
+
+    Like `get_random_sample`, only datasets with a non-zero 'score' are sampled. Their JSON
+    files are downloaded concurrently with `fetch_metadata`.
+
+    Parameters:
+    -----------
+    df : pandas DataFrame
+        The input DataFrame containing the 'score' and 'json_file' columns.
+    n : int or None
+        The number of datasets sampled without replacement, or None for every dataset.
+    where : pandas Series, callable or None
+        A boolean mask of the rows to sample from, or a function of the DataFrame returning
+        one, e.g. `lambda df: df["project"] == "..."`.
+    seed : int or None
+        The seed of the random sample.
+    as_frame : bool
+        If True, return a DataFrame with one row per JSON file and its nested fields
+        flattened into columns, indexed by 'json_file'.
+    **options
+        Options passed to `fetch_metadata`, such as `max_workers` or `cache`.
+
+    Returns:
+    --------
+    dict or pandas DataFrame
+        The JSON data of each sampled dataset, keyed by 'json_file'. Files that could not be
+        downloaded are None, or left out of the DataFrame.
+    """
+    rows = df["score"] != 0.0
+    if where is not None:
+        rows &= where(df) if callable(where) else where
 
-    return result.json()
+    json_files = df.loc[rows, "json_file"].dropna()
+    if n is not None and n < len(json_files):
+        json_files = json_files.sample(n, random_state=seed)
+
+    documents = fetch_metadata(json_files, **options)
+    if not as_frame:
+        return documents
+
+    documents = {key: value for key, value in documents.items() if value is not None}
+    data = pd.json_normalize(list(documents.values()))
+    data.index = pd.Index(list(documents), name="json_file")
+    return data
 
 
 def __get_lable_dict(name_lst):
@@ -186,33 +635,14 @@ def __create_general_modality_treemap(df):
         df (pandas.DataFrame): The input DataFrame containing the 'generalmodality' column.
 
     Returns:
-        None: The function generates a treemap and saves it as an image file, but it does not return any value.
-            The treemap is saved with a filename in the format 'treemap-general-modality-YYYYMMDD.png', where
-            'YYYYMMDD' represents the current date in year-month-day format.
+        str: The name of the file the treemap is saved as, in the format
+            'treemap-general-modality-YYYYMMDD.png', where 'YYYYMMDD' represents the current date in
+            year-month-day format.
     """
 
-    modality_counts = df["generalmodality"].value_counts().to_dict()
-    plt.figure(figsize=(14, 10))
-    values = list(modality_counts.values())
-    name = list(modality_counts.keys())
-    abbrName = __get_lable_dict(name)
-    colors = sb.color_palette("ocean", len(values))
-
-    num_labels = len(df.keys())
-    print(num_labels)
-
-    ax = squarify.plot(sizes=values, color=colors, label=abbrName.values(), alpha=0.8)
-    ax.axis("off")
-    ax.invert_xaxis()
-    ax.set_aspect("equal")
-
-    legend_patches = [plt.Rectangle((0, 0), 1, 1, fc=color) for color in colors]
-    plt.legend(
-        legend_patches, name, loc="upper left", bbox_to_anchor=(1, 1), fontsize="medium"
-    )
-
-    filename = f'treemap-general-modality-{datetime.now().strftime("%Y%m%d")}.png'
-    plt.savefig(filename)
+    filename = f'treemap-general-modality-{date.today().strftime("%Y%m%d")}.png'
+    __render_modality_treemap(__count_values(df["generalmodality"]), [filename])
+    return filename
 
 
 def __get_pretty_size_statistics(df):
@@ -283,16 +713,12 @@ def get_jsonFile(df):
         str: A string representing the formatted date in the 'year-day-month' format.
     """
 
+    df = df[["score", "json_file"]]  # only materialize the columns that are used
     isNotZero = df[df["score"] != 0.0]  # only have files with the correct data
     randomRow = isNotZero.iloc[
-        random.randint(0, len(isNotZero))
+        random.randrange(len(isNotZero))
     ]  # select a random row of random index
-    jsonFileLink = randomRow.json_file.replace(
-        "/bil/data", "https://download.brainimagelibrary.org", 1
-    )  # create the link
-    result = requests.get(jsonFileLink)
-
-    return result.json()
+    return fetch_metadata([randomRow.json_file])[randomRow.json_file]
 
 
 def get_date(df):
@@ -314,274 +740,1895 @@ def get_date(df):
         df
     )  # get the jsonFile information with get_jsonFile() function
     dateList = jsonFile["creation_date"].split()  # get creation_date
-    mntList = dict(
-        (month, index) for index, month in enumerate(calendar.month_abbr) if month
-    )  # month abbr to number
     yr = dateList[4]  # get year
-    mnt = mntList[dateList[1]]  # get month
+    mnt = MONTHS[dateList[1]]  # get month
     day = dateList[2]  # get day
     return f"{yr}-{day}-{mnt}"  # format in year-day-month
 
 
-def __get_affiliations(df):
-    return df["affiliation"].value_counts().keys()
-
-
-def today():
+def date_keys(df):
     """
-    Get the daily inventory report data for today.
+    Get the integer date keys of the datasets, parsed from the "creation_date" column.
 
-    This function attempts to fetch the daily inventory report data either from a local file
-    or from the web. If the data is available locally, it loads the data from the disk.
-    Otherwise, it makes a request to the server to fetch the data in JSON format, which is then
-    parsed into a pandas DataFrame.
+    The column is parsed once and the keys are cached for as long as `df` exists, so later
+    calls on the same frame reuse them while its "creation_date" column and its index are
+    the same objects. Checking this does not read the dates: a column or index that is
+    assigned anew is parsed again, but values edited in place are not noticed.
+
+    Parameters:
+    -----------
+    df : pandas DataFrame
+        The inventory, with a column named "creation_date".
 
     Returns:
     --------
     pandas DataFrame
-        A pandas DataFrame containing the daily inventory report data for today. If the data
-        cannot be fetched, an empty DataFrame is returned.
-
-    Note:
-    -----
-    The function first checks if the daily report data is available locally by looking in the
-    directory "/bil/data/inventory/daily/reports/". If the data exists locally, it is loaded from
-    the disk into a pandas DataFrame. If the data is not available locally, the function makes a
-    request to the web server "https://download.brainimagelibrary.org/inventory/daily/reports/"
-    to fetch the "today.json" file. If the request is successful (status code 200), the JSON data
-    is parsed into a dictionary and converted into a pandas DataFrame. If the request fails, an
-    error message is printed, and an empty DataFrame is returned.
+        A DataFrame with the same index as `df` and the columns "year" (e.g. 2023), "month"
+        (e.g. 202307) and "day" (e.g. 20230724). The keys of dates that are missing or
+        cannot be parsed are <NA>.
     """
-    # if file can be found locally, then load from disk
-    directory = "/bil/data/inventory/daily/reports/"
-    if Path(directory).exists():
-        data = json.loads(f"{directory}/today.json")
-        data = pd.DataFrame(data)
-        return data
+    storage = __column_storage(df["creation_date"])
+    cached = __DATE_KEYS.get(id(df))
+    if (
+        cached is not None
+        and cached[0]() is df
+        and cached[1] is df.index
+        and __same_storage(cached[2], storage)
+    ):
+        return cached[3]
+
+    dates = pd.to_datetime(
+        df["creation_date"].astype(object),
+        format=CREATION_DATE_FORMAT,
+        errors="coerce",
+    )
+    year = dates.dt.year.astype("Int16")
+    month = year.astype("Int32") * 100 + dates.dt.month.astype("Int32")
+    keys = pd.DataFrame(
+        {
+            "year": year,
+            "month": month,
+            "day": month * 100 + dates.dt.day.astype("Int32"),
+        },
+        index=df.index,
+    )
+    frame = weakref.ref(df, lambda reference, key=id(df): __DATE_KEYS.pop(key, None))
+    __DATE_KEYS[id(df)] = (frame, df.index, storage, keys)
+    return keys
 
-    # else get file from the web
-    server = "https://download.brainimagelibrary.org/inventory/daily/reports/"
-    filename = "today.json"
 
-    response = requests.get(f"{server}{filename}")
+def __column_storage(column):
+    """
+    Get the array holding the values of a column, without copying them.
 
-    # Check if the request was successful
-    if response.status_code == 200:
-        # Parse the JSON data into a dictionary
-        data = json.loads(response.text)
-        data = pd.DataFrame(data)
-        return data
-    else:
-        print("Error: Failed to fetch JSON data")
-        return pd.DataFrame()
+    Extension arrays, such as categoricals and Arrow strings, are the same object for as
+    long as the column is. NumPy columns are returned as a view of their buffer.
+    """
+    values = column.array
+    if isinstance(values, pd.arrays.NumpyExtensionArray):
+        return column.to_numpy(copy=False)
+    return values
 
 
-def __clean_affiliations(df):
+def __same_storage(stored, storage):
     """
-    Clean and aggregate the affiliation data in the input DataFrame.
+    Whether two results of `__column_storage()` hold the same values in the same memory.
+
+    The stored array keeps its memory alive, so the address cannot have been reused.
+    """
+    if isinstance(stored, np.ndarray) and isinstance(storage, np.ndarray):
+        return (
+            stored.__array_interface__["data"][0]
+            == storage.__array_interface__["data"][0]
+            and stored.shape == storage.shape
+            and stored.dtype == storage.dtype
+        )
+    return stored is storage
+
 
-    This function takes a pandas DataFrame `df` as input and performs some data cleaning
-    and aggregation operations on the "affiliation" column. It addresses issues where there
-    may be multiple variations of the same affiliation name (e.g., with or without trailing
-    spaces) and combines the counts of such variations to have a single representation in
-    the final result.
+def date_rollup(df, by=None, frequency="month"):
+    """
+    Count the datasets created in each year, month or day.
 
     Parameters:
     -----------
     df : pandas DataFrame
-        The input DataFrame containing affiliation information.
+        The inventory, with a column named "creation_date".
+    by : str or None
+        A column to count the datasets of each of its values separately, such as
+        "generalmodality", "project" or "affiliation".
+    frequency : str
+        "year", "month" or "day".
 
     Returns:
     --------
     pandas Series or DataFrame
-        A pandas Series or DataFrame with cleaned and aggregated affiliation data,
-        depending on the specific operations performed on the input DataFrame.
+        The number of datasets of each date key, see `date_keys`, in chronological order.
+        If `by` is given, a DataFrame with a column for each of its values. Datasets without
+        a valid creation date are left out.
+    """
+    if frequency not in ("year", "month", "day"):
+        raise ValueError(f"Error: Unsupported frequency {frequency}")
+
+    key = date_keys(df)[frequency]
+    if by is None:
+        return key.value_counts().sort_index().astype("int64")
+
+    counts = pd.crosstab(key, df[by].astype(object))
+    counts.columns.name = by
+    return counts
+
+
+def __iter_json_records(chunks):
+    """
+    Incrementally parse the records of a JSON array from a stream of text chunks.
+
+    Parameters:
+    -----------
+    chunks : iterable of str
+        Consecutive pieces of a document holding a JSON array of records, e.g. the
+        decoded body of an HTTP response or the contents of a file read in blocks.
+
+    Yields:
+    -------
+    dict
+        One record at a time, in document order.
+
+    Raises:
+    -------
+    ValueError
+        If the document is not a JSON array or ends before the array is closed.
+    json.JSONDecodeError
+        If a record is malformed, the records are not separated by exactly one comma or
+        the closing bracket is followed by anything but whitespace.
 
     Note:
     -----
-    The function aims to address cases where there are multiple variations of the same affiliation name
-    and combines their counts to provide a more accurate representation in the final result. The specific
-    operations and the final result may vary depending on the input DataFrame's content.
+    Only the text of the record being decoded is kept in memory, so the whole document
+    never has to be held as a single string.
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    buffer = ""
+    position = 0
+    # what comes next: "array" (the opening bracket), "first" (a record or the closing
+    # bracket), "record" (after a comma), "separator" (a comma or the closing bracket)
+    # or "end" (only whitespace, after the closing bracket)
+    expected = "array"
+    eof = False
+
+    while True:
+        position = __JSON_WHITESPACE.match(buffer, position).end()
+        if position < len(buffer):
+            character = buffer[position]
+            if expected == "array":
+                if character != "[":
+                    raise ValueError("Error: Expected a JSON array of records")
+                expected = "first"
+                position += 1
+                continue
+
+            if expected == "end":
+                raise json.JSONDecodeError("Extra data", buffer, position)
+
+            if expected == "separator":
+                if character == "]":
+                    expected = "end"
+                    position += 1
+                    continue
+                if character != ",":
+                    raise json.JSONDecodeError(
+                        "Expecting ',' delimiter", buffer, position
+                    )
+                expected = "record"
+                position += 1
+                continue
+
+            if character == "]" and expected == "first":
+                expected = "end"
+                position += 1
+                continue
+            if character in ",]":
+                raise json.JSONDecodeError("Expecting value", buffer, position)
+
+            try:
+                record, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # the record is incomplete, read more text unless there is none left
+                if eof:
+                    raise
+            else:
+                expected = "separator"
+                yield record
+                continue
+        elif eof:
+            if expected not in ("array", "end"):
+                raise ValueError("Error: Unexpected end of JSON array")
+            return
+
+        chunk = next(chunks, None)
+        eof = chunk is None
+        buffer = buffer[position:] + (chunk or "")
+        position = 0
+
+
+def __iter_file_chunks(filename):
     """
-    # Need to combine the universities so the pie chart shows a single university's total samples under the same area.
-    # right now there is one area of the pie chart that says 'Allen Institute for Brain Science' and 'Allen Instititute for Brain Science ' (with a space!)
-    # we need it to recognize that the Allen Institue for Brain Science has contributed a total number of samples equal to the sum of both those areas in the pie chart
-    Allen = df[df["affiliation"] == "Allen Institute for Brain Science"]
+    Read a local file in blocks of `READ_SIZE` bytes.
 
-    # ^we set a variable 'Allen' equal to the dataframe limited to the rows where it said 'Allen Institute for Brain Science and asked for the count of those rows
-    # below, we did the same thing but with rows that had Allen with a space
+    Parameters:
+    -----------
+    filename : str or pathlib.Path
+        The file to read.
 
-    Allen_with_space = df[df["affiliation"] == "Allen Institute for Brain Science "]
+    Yields:
+    -------
+    bytes
+        Consecutive blocks of the file.
+    """
+    with open(filename, "rb") as file:
+        for chunk in iter(lambda: file.read(READ_SIZE), b""):
+            yield chunk
 
-    accurate_Allen = len(Allen) + len(Allen_with_space)
 
-    del affiliations["Allen Institute for Brain Science "]
+def __iter_decompressed(chunks, compression=None):
+    """
+    Decompress a stream of bytes as it is read.
 
-    # Now we can add the counts we had before. (We deleted Allen with a space, but we still have the number of Allen with a space)
-    # reassign the Allen Institute for Brain Science variable to the actual total number (4715)
+    Parameters:
+    -----------
+    chunks : iterable of bytes
+        Consecutive pieces of the compressed data.
+    compression : str or None
+        Either "gzip", "zstd" or None if the data is not compressed. Decompressing
+        "zstd" requires the zstandard package.
 
-    affiliations["Allen Institute for Brain Science"] = len(Allen) + len(
-        Allen_with_space
-    )
+    Yields:
+    -------
+    bytes
+        Consecutive pieces of the decompressed data.
 
-    # Now we need to do the same thing with UCLA
-    # 1) limit the dictionary to ones that read 'University of California, Los Angeles' and the one that says 'University of California, Los Angeles (UCLA)'
+    Raises:
+    -------
+    ValueError
+        If the compression is not supported.
+    """
+    if compression is None:
+        yield from chunks
+        return
 
-    No_UCLA = affiliations["University of California, Los Angeles"]
+    if compression == "gzip":
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif compression == "zstd":
+        import zstandard
 
-    UCLA_present = affiliations["University of California, Los Angeles (UCLA)"]
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+    else:
+        raise ValueError(f"Error: Unsupported compression {compression}")
 
-    # 2) Now we found the counts of both. We have to set the college equal to the sum of the category with no UCLA and the catgory with UCLA and delete the one we don't want.
+    for chunk in chunks:
+        yield decompressor.decompress(chunk)
+    yield decompressor.flush()
 
-    # del affiliations['University of California, Los Angeles (UCLA)']
-    # print(len(affiliations))
 
-    accurate_Uni = (
-        affiliations["University of California, Los Angeles"]
-        + affiliations["University of California, Los Angeles (UCLA)"]
-    )
+def __iter_text(chunks):
+    """
+    Decode a stream of UTF-8 bytes into text, skipping empty pieces.
 
-    del affiliations["University of California, Los Angeles (UCLA)"]
-    return affiliations
+    Parameters:
+    -----------
+    chunks : iterable of bytes
+        Consecutive pieces of UTF-8 encoded text. Multi-byte characters may be split
+        across pieces.
+
+    Yields:
+    -------
+    str
+        Consecutive pieces of the decoded text.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
 
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
 
-def __get_affiliation_frequency(df):
+
+def __apply_schema(data):
     """
-    Get a dictionary containing the count of occurrences of each unique affiliation.
+    Convert the columns of an inventory to the dtypes declared in the schema.
 
-    This function takes a pandas DataFrame `df` as input and counts the occurrences of each
-    unique value in the "affiliation" column. The result is returned as a dictionary, where
-    the keys represent unique affiliations, and the values represent the count of occurrences
-    for each affiliation.
+    Columns listed in `CATEGORICAL_COLUMNS` become categoricals and columns listed in
+    `NUMERIC_COLUMNS` become the declared numeric dtypes. Integer columns with missing
+    values are stored as float64 instead.
 
     Parameters:
     -----------
-    df : pandas DataFrame
-        The input DataFrame containing a column named "affiliation" with affiliation information.
+    data : pandas DataFrame
+        The inventory to convert. It is modified in place.
 
     Returns:
     --------
-    dict
-        A dictionary where the keys represent unique affiliations, and the values represent
-        the count of occurrences for each affiliation.
-
-    Note:
-    -----
-    The input DataFrame `df` should have a column named "affiliation" containing categorical data
-    representing different affiliations. The function counts the occurrences of each unique affiliation
-    and returns the result as a dictionary.
+    pandas DataFrame
+        The converted inventory.
     """
-    return df["affiliation"].value_counts().to_dict()
+    for column in CATEGORICAL_COLUMNS:
+        if column in data and not isinstance(data[column].dtype, pd.CategoricalDtype):
+            try:
+                data[column] = data[column].astype("category")
+            except TypeError:
+                # unhashable values, such as lists, cannot be categories
+                pass
 
+    for column, dtype in NUMERIC_COLUMNS.items():
+        if column in data:
+            values = pd.to_numeric(data[column], errors="coerce")
+            if pd.api.types.is_integer_dtype(dtype) and values.isna().any():
+                dtype = "float64"
+            data[column] = values.astype(dtype)
 
-def __get_number_of_datasets(df):
-    """
-    Get the total number of datasets in the input DataFrame.
+    return data
 
-    This function takes a pandas DataFrame `df` as input and returns the total number of datasets
-    present in the DataFrame.
+
+def __concat_frames(frames):
+    """
+    Concatenate inventory chunks while keeping categorical columns categorical.
 
     Parameters:
     -----------
-    df : pandas DataFrame
-        The input DataFrame containing dataset information.
+    frames : list of pandas DataFrame
+        The chunks to concatenate, each converted with `__apply_schema`.
 
     Returns:
     --------
-    int
-        The total number of datasets in the DataFrame.
-
-    Note:
-    -----
-    The function simply returns the length of the DataFrame `df`, which corresponds to the total number
-    of datasets present in the DataFrame.
+    pandas DataFrame
+        The concatenated inventory.
     """
-    return len(df)
+    for column in CATEGORICAL_COLUMNS:
+        parts = [
+            frame[column]
+            for frame in frames
+            if column in frame and isinstance(frame[column].dtype, pd.CategoricalDtype)
+        ]
+        if len(parts) < 2:
+            continue
+
+        # chunks must share their categories for the result to stay categorical
+        categories = pd.Index(
+            pd.concat([pd.Series(part.cat.categories) for part in parts]).unique()
+        )
+        for frame in frames:
+            if column in frame:
+                frame[column] = frame[column].cat.set_categories(categories)
 
+    # columns missing from some chunks come back as objects and are converted again
+    return __apply_schema(pd.concat(frames, ignore_index=True))
 
-def __get_completeness_score(df):
+
+def __records_to_dataframe(records, chunksize=CHUNK_SIZE, columns=None):
     """
-    Calculate the completeness score for a given DataFrame.
+    Build a DataFrame from an iterable of records, `chunksize` records at a time.
 
-    The completeness score is computed as the sum of the values in the "score" column
-    divided by the total number of rows in the DataFrame.
+    Each chunk is converted to the declared schema as soon as it is built, so the
+    records are held as Python objects for one chunk at a time only.
 
     Parameters:
     -----------
-    df : pandas DataFrame
-        The input DataFrame containing a column named "score" which holds numerical values.
+    records : iterable of dict
+        The records to convert, e.g. as produced by `__iter_json_records`.
+    chunksize : int
+        The maximum number of records held as Python objects at any one time.
+    columns : list or None
+        The fields to keep. Other fields are dropped as soon as each record is parsed.
+        All fields are kept if None.
 
     Returns:
     --------
-    float
-        The completeness score of the DataFrame.
-
-    Note:
-    -----
-    The input DataFrame `df` should have a column named "score" containing numerical values.
-    The function calculates the completeness score as the sum of the values in the "score" column
-    divided by the total number of rows in the DataFrame.
+    pandas DataFrame
+        A DataFrame with one row per record. An empty DataFrame is returned if there
+        are no records.
     """
-    return df["score"].sum() / len(df)
+    frames = []
+    batch = []
+    for record in records:
+        if columns is not None:
+            record = {column: record.get(column) for column in columns}
+        batch.append(record)
+        if len(batch) >= chunksize:
+            frames.append(
+                __apply_schema(pd.DataFrame.from_records(batch, columns=columns))
+            )
+            batch = []
 
+    if batch:
+        frames.append(__apply_schema(pd.DataFrame.from_records(batch, columns=columns)))
 
-def __is_reachable(url):
+    if not frames:
+        return pd.DataFrame(columns=columns)
+
+    return __concat_frames(frames)
+
+
+def __snapshot_path(cache_directory, source, key):
     """
-    Check if the given URL is reachable and returns a boolean value indicating its reachability.
+    Get the path of the cached snapshot of `source` identified by `key`.
 
     Parameters:
     -----------
-    url : str
-        The URL to be checked for reachability.
+    cache_directory : str or pathlib.Path
+        The directory holding the cached snapshots.
+    source : str
+        The file name or URL the inventory was read from.
+    key : str
+        A value that changes whenever the source changes, e.g. its ETag or modification time.
 
     Returns:
     --------
-    bool
-        True if the URL is reachable (status code 200), False otherwise.
-
-    Note:
-    -----
-    This function uses the `requests` library to send an HTTP GET request to the specified URL.
-    It checks the status code of the response, and if the status code is 200, it returns True,
-    indicating that the URL is reachable. Otherwise, it returns False to indicate that the URL
-    is not reachable or encountered an error.
+    pathlib.Path
+        The path of the Feather file holding the snapshot.
     """
-    response = requests.get(url)
-
-    if response.status_code == 200:
-        return True
-    else:
-        return False
+    digest = hashlib.sha1(f"{source}\n{key}".encode("utf-8")).hexdigest()[:16]
+    return Path(cache_directory) / f"today-{digest}.feather"
 
 
-def __are_reachable(df):
+def __load_snapshot(snapshot, columns=None):
     """
-    Compute the reachability of datasets specified in the DataFrame.
-
-    This method checks the reachability of each dataset URL in the "URL" column of the DataFrame
-    by invoking the __is_it_reachable function in parallel using the pandas parallel_apply method.
-    The reachability of each URL is stored in a new column named "is_reachable" in the DataFrame.
-    The method then returns the ratio of reachable datasets to the total number of datasets.
+    Load a cached inventory snapshot.
 
     Parameters:
     -----------
-    df : pandas DataFrame
-        The input DataFrame containing a column named "URL" with dataset URLs to be checked.
+    snapshot : pathlib.Path
+        The Feather file holding the snapshot.
+    columns : list or None
+        The columns to read. Columns missing from the snapshot are filled with missing
+        values. All columns are read if None.
 
     Returns:
     --------
-    float
-        The ratio of reachable datasets to the total number of datasets.
+    pandas DataFrame or None
+        The cached inventory, or None if the snapshot is missing or cannot be read.
+    """
+    if snapshot is None or not snapshot.exists():
+        return None
+
+    try:
+        if columns is None:
+            data = pd.read_feather(snapshot)
+        else:
+            available = LazyInventory(snapshot).columns
+            present = [column for column in columns if column in available]
+            data = pd.read_feather(snapshot, columns=present).reindex(columns=columns)
+    except (ImportError, OSError, ValueError) as error:
+        print(f"Warning: Unable to read cached inventory {snapshot}: {error}")
+        return None
+
+    # mark the snapshot as recently used so it is the last one to be evicted
+    os.utime(snapshot)
+    return data
+
+
+def __save_snapshot(data, snapshot, metadata, max_bytes=CACHE_MAX_BYTES):
+    """
+    Save an inventory snapshot to the cache and evict old snapshots.
+
+    Parameters:
+    -----------
+    data : pandas DataFrame
+        The inventory to cache.
+    snapshot : pathlib.Path
+        The Feather file to write.
+    metadata : dict
+        Information about the source of the snapshot, written next to it as JSON.
+    max_bytes : int
+        The maximum total size of the cached snapshots.
+    """
+    snapshot.parent.mkdir(parents=True, exist_ok=True)
+    temporary = snapshot.with_suffix(".tmp")
+
+    try:
+        data.to_feather(temporary)
+    except (ImportError, TypeError, ValueError) as error:
+        print(f"Warning: Unable to cache inventory: {error}")
+        if temporary.exists():
+            temporary.unlink()
+        return
+
+    snapshot.with_suffix(".json").write_text(json.dumps(metadata))
+    os.replace(temporary, snapshot)
+    __evict_snapshots(snapshot.parent, max_bytes)
+
+
+def __evict_snapshots(cache_directory, max_bytes=CACHE_MAX_BYTES):
+    """
+    Remove the least recently used snapshots until the cache fits in `max_bytes`.
+
+    Parameters:
+    -----------
+    cache_directory : pathlib.Path
+        The directory holding the cached snapshots.
+    max_bytes : int
+        The maximum total size of the cached snapshots. The most recently used
+        snapshot is always kept.
+    """
+    snapshots = Path(cache_directory).glob("today-*.feather")
+    for snapshot in __evict_files(snapshots, max_bytes):
+        sidecar = snapshot.with_suffix(".json")
+        if sidecar.exists():
+            sidecar.unlink()
+
+
+def __evict_files(files, max_bytes, keep=()):
+    """
+    Remove the least recently used of `files` until their total size fits in `max_bytes`.
+
+    Parameters:
+    -----------
+    files : iterable of pathlib.Path
+        The cached files. Their modification time is the time they were last used.
+    max_bytes : int
+        The maximum total size of the files. The most recently used file is always kept.
+    keep : iterable of pathlib.Path
+        The files that are never removed.
+
+    Returns:
+    --------
+    list of pathlib.Path
+        The removed files.
+    """
+    keep = set(keep)
+    files = sorted(files, key=lambda file: file.stat().st_mtime, reverse=True)
+
+    removed = []
+    total = 0
+    for index, file in enumerate(files):
+        total += file.stat().st_size
+        if index > 0 and total > max_bytes and file not in keep:
+            file.unlink(missing_ok=True)
+            removed.append(file)
+    return removed
+
+
+def __find_snapshot(cache_directory, source):
+    """
+    Find the most recently used cached snapshot of `source`.
+
+    Parameters:
+    -----------
+    cache_directory : str or pathlib.Path
+        The directory holding the cached snapshots.
+    source : str
+        The file name or URL the inventory was read from.
+
+    Returns:
+    --------
+    tuple
+        The path of the snapshot and the metadata saved with it, or (None, None) if
+        `source` has no cached snapshot.
+    """
+    found = (None, None)
+    latest = None
+    for sidecar in Path(cache_directory).glob("today-*.json"):
+        snapshot = sidecar.with_suffix(".feather")
+        try:
+            metadata = json.loads(sidecar.read_text())
+            mtime = snapshot.stat().st_mtime
+        except (OSError, ValueError):
+            continue
+
+        if metadata.get("source") == source and (latest is None or mtime > latest):
+            found = (snapshot, metadata)
+            latest = mtime
+
+    return found
+
+
+def __max_rss():
+    """
+    Get the peak resident set size of the process in bytes, or None if unknown.
+    """
+    if resource is None:
+        return None
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+@contextmanager
+def measure(stage, timings):
+    """
+    Record the wall time, CPU time and peak memory of a stage of the report pipeline.
+
+    Parameters:
+    -----------
+    stage : str
+        The name of the stage, e.g. "today.parse" or "metric:species".
+    timings : list or None
+        The list the measurement is appended to as a dictionary with the keys "stage",
+        "wall_seconds", "cpu_seconds", "peak_traced_bytes", "max_rss_bytes" and
+        "rss_growth_bytes". Nothing is measured if None.
+
+    Note:
+    -----
+    The CPU time is that of the calling thread. "peak_traced_bytes" is the peak of the
+    memory held by Python objects during the stage, including memory allocated before it,
+    and is only recorded while `tracemalloc` is tracing (e.g. with PYTHONTRACEMALLOC=1) on
+    Python 3.9 or later, otherwise it is None. The peak is shared by all threads, so it is
+    approximate for stages that run concurrently. "max_rss_bytes" is not specific to the
+    stage: it is the peak resident set size of the whole process since it started, which
+    never decreases. "rss_growth_bytes" is how much the stage raised that peak, 0 if the
+    stage used less memory than an earlier one.
+
+    Example:
+        >>> timings = []
+        >>> with measure("load", timings):
+        ...     df = today()
+    """
+    if timings is None:
+        yield
+        return
+
+    # tracemalloc.reset_peak() was added in Python 3.9
+    tracing = tracemalloc.is_tracing() and hasattr(tracemalloc, "reset_peak")
+    if tracing:
+        tracemalloc.reset_peak()
+    rss = __max_rss()
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall
+        cpu = time.thread_time() - cpu
+        peak = tracemalloc.get_traced_memory()[1] if tracing else None
+        max_rss = __max_rss()
+        timings.append(
+            {
+                "stage": stage,
+                "wall_seconds": wall,
+                "cpu_seconds": cpu,
+                "peak_traced_bytes": peak,
+                "max_rss_bytes": max_rss,
+                "rss_growth_bytes": None if rss is None else max_rss - rss,
+            }
+        )
+
+
+def __timed(iterable, totals):
+    """
+    Iterate over `iterable`, adding the wall and CPU time spent producing its items to
+    `totals`, a list holding the two running sums.
+    """
+    iterator = iter(iterable)
+    while True:
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            totals[0] += time.perf_counter() - wall
+            totals[1] += time.thread_time() - cpu
+        yield item
+
+
+def __parse_stream(chunks, compression, chunksize, columns=None, timings=None):
+    """
+    Decompress, decode and parse a stream of bytes into an inventory DataFrame.
+
+    Parameters:
+    -----------
+    chunks : iterable of bytes
+        The raw contents of the inventory file.
+    compression : str or None
+        The compression of the file, either "gzip", "zstd" or None.
+    chunksize : int
+        The number of records converted into a DataFrame at a time.
+    columns : list or None
+        The fields to keep, or None to keep all of them.
+    timings : list or None
+        The list the timings of the "today.fetch" (reading, decompressing and decoding the
+        source), "today.parse" (decoding JSON) and "today.dataframe" (building the
+        DataFrame) stages are appended to, see `measure()`. As the stages are interleaved
+        while streaming, each one is the sum of the time spent in it.
+
+    Returns:
+    --------
+    pandas DataFrame
+        The inventory.
+    """
+    text = __iter_text(__iter_decompressed(chunks, compression))
+    if timings is None:
+        return __records_to_dataframe(__iter_json_records(text), chunksize, columns)
+
+    fetch = [0.0, 0.0]
+    parse = [0.0, 0.0]
+    text = __timed(text, fetch)
+    records = __timed(__iter_json_records(text), parse)
+
+    stages = []
+    with measure("today.dataframe", stages):
+        data = __records_to_dataframe(records, chunksize, columns)
+
+    # the time spent parsing includes fetching, and building includes both
+    dataframe = stages[0]
+    dataframe["wall_seconds"] -= parse[0]
+    dataframe["cpu_seconds"] -= parse[1]
+    for stage, wall, cpu in [
+        ("today.fetch", fetch[0], fetch[1]),
+        ("today.parse", parse[0] - fetch[0], parse[1] - fetch[1]),
+    ]:
+        timings.append(
+            {
+                "stage": stage,
+                "wall_seconds": wall,
+                "cpu_seconds": cpu,
+                "peak_traced_bytes": None,
+                "max_rss_bytes": None,
+                "rss_growth_bytes": None,
+            }
+        )
+    timings.append(dataframe)
+
+    return data
+
+
+def __fetch_inventory(
+    url,
+    headers,
+    compression=None,
+    chunksize=CHUNK_SIZE,
+    columns=None,
+    timings=None,
+    timeout=INVENTORY_TIMEOUT,
+):
+    """
+    Stream the inventory from the web server.
+
+    Parameters:
+    -----------
+    url : str
+        The URL of the inventory.
+    headers : dict
+        Extra request headers, e.g. the validators of a conditional request.
+    compression : str or None
+        The compression of the file at `url`, either "gzip", "zstd" or None.
+    chunksize : int
+        The number of records converted into a DataFrame at a time.
+    columns : list or None
+        The fields to keep, or None to keep all of them.
+    timings : list or None
+        The list the timings of the stages are appended to, see `__parse_stream()`.
+    timeout : float
+        The seconds the server may take to accept the connection or send the next piece
+        of the inventory.
+
+    Returns:
+    --------
+    tuple
+        The status code of the response, the inventory as a pandas DataFrame (None
+        unless the status code is 200) and the response headers.
+    """
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code != 200:
+            return response.status_code, None, response.headers
+
+        # the server may already have declared the compression as a content encoding,
+        # in which case requests has decompressed the body
+        if response.headers.get("Content-Encoding") == compression:
+            compression = None
+
+        chunks = response.iter_content(chunk_size=READ_SIZE)
+        data = __parse_stream(chunks, compression, chunksize, columns, timings)
+        return response.status_code, data, response.headers
+
+
+def __load_inventory(
+    directory,
+    server,
+    chunksize,
+    compression,
+    cache,
+    cache_directory,
+    cache_max_bytes,
+    columns=None,
+    read=True,
+    timings=None,
+):
+    """
+    Load the daily inventory and locate its cached snapshot.
+
+    This function does the work of `today()`, see there for the parameters.
+
+    Parameters:
+    -----------
+    columns : list or None
+        The columns to load, or None to load all of them. An inventory that is not
+        cached yet is only cached when all of its columns are loaded.
+    read : bool
+        If False, a snapshot found in the cache is not read and None is returned
+        instead of the inventory.
+    timings : list or None
+        The list the timings of the stages are appended to, see `measure()`.
+
+    Returns:
+    --------
+    tuple
+        The inventory as a pandas DataFrame (None if the request failed or `read` is
+        False and the inventory is cached) and the path of the snapshot holding the
+        whole inventory (None if it is not cached).
+    """
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Error: Unsupported compression {compression}")
+    if compression == "zstd" and importlib.util.find_spec("zstandard") is None:
+        raise ValueError(
+            "Error: Reading zstd compressed inventories requires the zstandard package, "
+            "install braininventory[zstd]"
+        )
+
+    cache_directory = cache_directory or CACHE_DIRECTORY
+    filename = f"{INVENTORY_FILENAME}{COMPRESSION_SUFFIXES[compression]}"
+
+    # if file can be found locally, then load from disk
+    path = Path(directory) / filename
+    if path.exists():
+        status = path.stat()
+        key = f"{status.st_mtime_ns}-{status.st_size}"
+        snapshot = __snapshot_path(cache_directory, path, key)
+        if cache and snapshot.exists():
+            if not read:
+                return None, snapshot
+            with measure("today.cache_read", timings):
+                data = __load_snapshot(snapshot, columns)
+            if data is not None:
+                return data, snapshot
+
+        chunks = __iter_file_chunks(path)
+        data = __parse_stream(chunks, compression, chunksize, columns, timings)
+        if not cache or columns is not None:
+            return data, None
+
+        metadata = {"source": str(path), "key": key}
+        with measure("today.cache_write", timings):
+            __save_snapshot(data, snapshot, metadata, cache_max_bytes)
+        return data, snapshot if snapshot.exists() else None
+
+    # else get file from the web, unless it has not changed since it was cached
+    url = f"{server}{filename}"
+
+    headers = {}
+    snapshot, metadata = (None, None)
+    if cache:
+        snapshot, metadata = __find_snapshot(cache_directory, url)
+    if metadata is not None:
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+
+    status_code, data, response_headers = __fetch_inventory(
+        url, headers, compression, chunksize, columns, timings
+    )
+    if status_code == 304:
+        if not read:
+            return None, snapshot
+        with measure("today.cache_read", timings):
+            data = __load_snapshot(snapshot, columns)
+        if data is not None:
+            return data, snapshot
+
+        # the cached snapshot is unreadable, so fetch the inventory again
+        status_code, data, response_headers = __fetch_inventory(
+            url, {}, compression, chunksize, columns, timings
+        )
+
+    # Check if the request was successful
+    if status_code != 200:
+        print("Error: Failed to fetch JSON data")
+        return None, None
+
+    etag = response_headers.get("ETag")
+    last_modified = response_headers.get("Last-Modified")
+    if not cache or columns is not None or not (etag or last_modified):
+        return data, None
+
+    metadata = {
+        "source": url,
+        "key": etag or last_modified,
+        "etag": etag,
+        "last_modified": last_modified,
+    }
+    snapshot = __snapshot_path(cache_directory, url, metadata["key"])
+    with measure("today.cache_write", timings):
+        __save_snapshot(data, snapshot, metadata, cache_max_bytes)
+    return data, snapshot if snapshot.exists() else None
+
+
+class LazyInventory:
+    """
+    A daily inventory whose columns are read from its cached snapshot on first access.
+
+    Only the columns that are used are ever read into memory, and each of them is read
+    once. Columns are accessed like those of a DataFrame, e.g. `inventory["score"]` or
+    `inventory[["score", "json_file"]]`.
+
+    Parameters:
+    -----------
+    snapshot : str or pathlib.Path
+        The Feather file holding the snapshot, as written by `today()`.
+    columns : list or None
+        The columns of the inventory, or None for all the columns of the snapshot.
+        Columns missing from the snapshot are filled with missing values.
+    """
+
+    def __init__(self, snapshot, columns=None):
+        import pyarrow
+        import pyarrow.ipc
+
+        self.snapshot = Path(snapshot)
+        with pyarrow.ipc.open_file(pyarrow.memory_map(str(self.snapshot))) as reader:
+            self._stored = pd.Index(reader.schema.names)
+            self._length = sum(
+                reader.get_batch(index).num_rows
+                for index in range(reader.num_record_batches)
+            )
+        self.columns = self._stored if columns is None else pd.Index(columns)
+        self._loaded = {}
+
+    def __len__(self):
+        return self._length
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.load([key])[key]
+        return self.load(list(key))
+
+    def keys(self):
+        return self.columns
+
+    def load(self, columns=None):
+        """
+        Read columns of the inventory into a DataFrame.
+
+        Parameters:
+        -----------
+        columns : list or None
+            The columns to read, or None to read all of them.
+
+        Returns:
+        --------
+        pandas DataFrame
+            The requested columns, in the requested order.
+
+        Raises:
+        -------
+        KeyError
+            If a column is not part of the inventory.
+        """
+        columns = list(self.columns if columns is None else columns)
+        missing = [column for column in columns if column not in self.columns]
+        if missing:
+            raise KeyError(f"Error: Columns not found in inventory: {missing}")
+
+        unread = [column for column in columns if column not in self._loaded]
+        stored = [column for column in unread if column in self._stored]
+        if stored:
+            data = pd.read_feather(self.snapshot, columns=stored)
+            for column in stored:
+                self._loaded[column] = data[column]
+        for column in unread:
+            if column not in self._loaded:
+                self._loaded[column] = pd.Series(
+                    np.nan, index=pd.RangeIndex(self._length), name=column
+                )
+
+        return pd.DataFrame({column: self._loaded[column] for column in columns})
+
+
+def today(
+    directory=INVENTORY_DIRECTORY,
+    server=INVENTORY_SERVER,
+    chunksize=CHUNK_SIZE,
+    compression=None,
+    cache=True,
+    cache_directory=None,
+    cache_max_bytes=CACHE_MAX_BYTES,
+    columns=None,
+    lazy=False,
+    timings=None,
+):
+    """
+    Get the daily inventory report data for today.
+
+    This function attempts to fetch the daily inventory report data either from a local file
+    or from the web. If the data is available locally, it is streamed from the disk.
+    Otherwise, the JSON data is streamed from the server. In both cases the records are
+    parsed incrementally and turned into a pandas DataFrame in chunks, so the raw document
+    is never held in memory as a whole.
+
+    Parsed inventories are cached as Feather snapshots, keyed by the modification time of
+    the local file or by the ETag/Last-Modified header of the server. Requests to the server
+    are conditional on the validators of the cached snapshot, so an unchanged inventory is
+    answered with "304 Not Modified" and read from the cache.
+
+    Parameters:
+    -----------
+    directory : str
+        The local directory holding "today.json".
+    server : str
+        The URL of the directory holding "today.json" on the web server.
+    chunksize : int
+        The number of records converted into a DataFrame at a time.
+    compression : str or None
+        Read the compressed variant of the inventory, either "gzip" ("today.json.gz") or
+        "zstd" ("today.json.zst"), and decompress it while streaming. Decompressing "zstd"
+        requires the zstandard package, installed with the "zstd" extra.
+    cache : bool
+        Whether to read and write cached snapshots.
+    cache_directory : str or None
+        The directory holding the cached snapshots. Defaults to `CACHE_DIRECTORY`, which
+        can be set with the BRAININVENTORY_CACHE environment variable.
+    cache_max_bytes : int
+        The maximum total size of the cached snapshots. The least recently used
+        snapshots are removed once it is exceeded.
+    columns : list or None
+        The columns to load. Other fields are dropped as each record is parsed, or not
+        read at all from a cached snapshot. An inventory that is not cached yet is not
+        cached by a call that only loads some of its columns. All columns are loaded if None.
+    lazy : bool
+        If True, return a `LazyInventory` that reads each column from the cached snapshot
+        the first time it is used, restricted to `columns` if given. The inventory is
+        loaded and cached first if needed. If the inventory cannot be cached, the
+        DataFrame is returned instead.
+    timings : list or None
+        A list the wall time, CPU time and memory use of the loading stages are appended
+        to, see `measure()`. Streaming is timed as "today.fetch", "today.parse" and
+        "today.dataframe", reading and writing the cache as "today.cache_read" and
+        "today.cache_write".
+
+    Returns:
+    --------
+    pandas DataFrame or LazyInventory
+        A pandas DataFrame containing the daily inventory report data for today. If the data
+        cannot be fetched, an empty DataFrame is returned.
+
+    Note:
+    -----
+    The function first checks if the daily report data is available locally by looking in the
+    directory "/bil/data/inventory/daily/reports/". If the data exists locally, it is loaded from
+    the disk into a pandas DataFrame. If the data is not available locally, the function makes a
+    request to the web server "https://download.brainimagelibrary.org/inventory/daily/reports/"
+    to fetch the "today.json" file. If the request is successful (status code 200), the body
+    is parsed as it arrives and converted into a pandas DataFrame. If the request fails, an
+    error message is printed, and an empty DataFrame is returned.
+    """
+    if lazy:
+        data, snapshot = __load_inventory(
+            directory,
+            server,
+            chunksize,
+            compression,
+            cache,
+            cache_directory,
+            cache_max_bytes,
+            read=False,
+            timings=timings,
+        )
+        if snapshot is not None:
+            # mark the snapshot as recently used, like a cached read does
+            os.utime(snapshot)
+            return LazyInventory(snapshot, columns)
+        if data is not None and columns is not None:
+            data = data.reindex(columns=columns)
+    else:
+        data, snapshot = __load_inventory(
+            directory,
+            server,
+            chunksize,
+            compression,
+            cache,
+            cache_directory,
+            cache_max_bytes,
+            columns,
+            timings=timings,
+        )
+
+    if data is None:
+        return pd.DataFrame(columns=columns)
+    return data
+
+
+def load_canonical_names(names):
+    """
+    Load the canonical names of the variants of column values.
+
+    Parameters:
+    -----------
+    names : dict, str or pathlib.Path
+        A dictionary mapping column names to dictionaries from variants to canonical
+        values, e.g. `{"affiliation": {"Allen Institute for Brain Science ": "Allen
+        Institute for Brain Science"}}`, or a JSON file holding one.
+
+    Returns:
+    --------
+    dict
+        The canonical names of the variants of each column. Chains of names are resolved,
+        so if A is a variant of B and B a variant of C, both A and B map to C.
+
+    Raises:
+    -------
+    ValueError
+        If the names of a column form a cycle, e.g. A is a variant of B and B of A.
+    """
+    if not isinstance(names, dict):
+        with open(names, "r", encoding="utf-8") as file:
+            names = json.load(file)
+    return {
+        column: __resolve_names(mapping) if mapping else mapping
+        for column, mapping in names.items()
+    }
+
+
+def __resolve_names(mapping):
+    """
+    Map every variant to the end of its chain of canonical names.
+    """
+    resolved = {}
+    for variant, name in mapping.items():
+        seen = {variant}
+        while name in mapping and mapping[name] != name:
+            if name in seen:
+                raise ValueError(
+                    f"Error: The canonical names of {variant} form a cycle"
+                )
+            seen.add(name)
+            name = mapping[name]
+        resolved[variant] = name
+    return resolved
+
+
+def __remap(series, mapping):
+    """
+    Replace the values of a Series with their canonical names, mapping each unique value
+    once and taking the integer codes of the rows.
+    """
+    categorical = isinstance(series.dtype, pd.CategoricalDtype)
+    if categorical:
+        codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series)
+
+    canonical = pd.Index([mapping.get(value, value) for value in uniques], dtype=object)
+    lookup, categories = pd.factorize(canonical)
+    codes = np.where(codes >= 0, lookup[codes], -1)
+    remapped = pd.Series(
+        pd.Categorical.from_codes(codes, categories),
+        index=series.index,
+        name=series.name,
+    )
+    return remapped if categorical else remapped.astype(series.dtype)
+
+
+def canonicalize(df, names=None):
+    """
+    Replace the variants of column values with their canonical names.
+
+    Each column is remapped at once: its unique values (the categories of categorical
+    columns) are looked up in the mapping and the rows take the codes of their canonical
+    values, so the cost does not depend on how many rows hold each variant.
+
+    Parameters:
+    -----------
+    df : pandas DataFrame
+        The inventory.
+    names : dict, str, pathlib.Path or None
+        The canonical names of the variants of each column, or a JSON file holding them,
+        see `load_canonical_names()`. Defaults to CANONICAL_NAMES.
+
+    Returns:
+    --------
+    pandas DataFrame
+        A copy of the inventory with the variants replaced. Columns missing from the
+        inventory are ignored and `df` is not modified.
+    """
+    names = load_canonical_names(CANONICAL_NAMES if names is None else names)
+    columns = {
+        column: __remap(df[column], mapping)
+        for column, mapping in names.items()
+        if mapping and column in df
+    }
+    return df.assign(**columns)
+
+
+def __clean_affiliations(df):
+    """
+    Clean and aggregate the affiliation data in the input DataFrame.
+
+    This function takes a pandas DataFrame `df` as input and counts the datasets of each
+    affiliation after replacing the known variations of the same affiliation name (e.g., with
+    or without trailing spaces, or with an acronym) with a single name, see CANONICAL_NAMES.
+
+    Parameters:
+    -----------
+    df : pandas DataFrame
+        The input DataFrame containing affiliation information.
+
+    Returns:
+    --------
+    pandas Series
+        The number of datasets of each affiliation, with the counts of the variations of an
+        affiliation combined.
+    """
+    names = {"affiliation": CANONICAL_NAMES["affiliation"]}
+    return __count_values(canonicalize(df[["affiliation"]], names)["affiliation"])
+
+
+def __get_affiliation_frequency(df):
+    """
+    Get a dictionary containing the count of occurrences of each unique affiliation.
+
+    This function takes a pandas DataFrame `df` as input and counts the occurrences of each
+    unique value in the "affiliation" column. The result is returned as a dictionary, where
+    the keys represent unique affiliations, and the values represent the count of occurrences
+    for each affiliation.
+
+    Parameters:
+    -----------
+    df : pandas DataFrame
+        The input DataFrame containing a column named "affiliation" with affiliation information.
+
+    Returns:
+    --------
+    dict
+        A dictionary where the keys represent unique affiliations, and the values represent
+        the count of occurrences for each affiliation.
+
+    Note:
+    -----
+    The input DataFrame `df` should have a column named "affiliation" containing categorical data
+    representing different affiliations. The function counts the occurrences of each unique affiliation
+    and returns the result as a dictionary.
+    """
+    return __count_values(df["affiliation"]).to_dict()
+
+
+def __get_number_of_datasets(df):
+    """
+    Get the total number of datasets in the input DataFrame.
+
+    This function takes a pandas DataFrame `df` as input and returns the total number of datasets
+    present in the DataFrame.
+
+    Parameters:
+    -----------
+    df : pandas DataFrame
+        The input DataFrame containing dataset information.
+
+    Returns:
+    --------
+    int
+        The total number of datasets in the DataFrame.
 
     Note:
     -----
-    This function requires the __is_it_reachable function to be defined separately, which checks
-    the reachability of a single URL. The DataFrame `df` should have a column named "URL" with the
-    dataset URLs to be checked for reachability. The method computes the ratio of reachable datasets
-    to the total number of datasets and returns this value as a float.
+    The function simply returns the length of the DataFrame `df`, which corresponds to the total number
+    of datasets present in the DataFrame.
     """
+    return len(df)
+
+
+def __get_completeness_score(df):
+    """
+    Calculate the completeness score for a given DataFrame.
+
+    The completeness score is computed as the sum of the values in the "score" column
+    divided by the total number of rows in the DataFrame.
+
+    Parameters:
+    -----------
+    df : pandas DataFrame
+        The input DataFrame containing a column named "score" which holds numerical values.
+
+    Returns:
+    --------
+    float
+        The completeness score of the DataFrame.
+
+    Note:
+    -----
+    The input DataFrame `df` should have a column named "score" containing numerical values.
+    The function calculates the completeness score as the sum of the values in the "score" column
+    divided by the total number of rows in the DataFrame.
+    """
+    return df["score"].sum() / len(df)
+
+
+def __is_reachable(url):
+    """
+    Check if the given URL is reachable and returns a boolean value indicating its reachability.
+
+    Parameters:
+    -----------
+    url : str
+        The URL to be checked for reachability.
+
+    Returns:
+    --------
+    bool
+        True if the URL is reachable (status code 200), False otherwise.
+
+    Note:
+    -----
+    This function uses the `requests` library to send an HTTP HEAD request to the specified URL,
+    so the body of the dataset is not downloaded. To check many URLs, use `check_reachability`.
+    """
+    response = requests.head(url, allow_redirects=True, timeout=REACHABILITY_TIMEOUT)
+
+    if response.status_code == 200:
+        return True
+    else:
+        return False
+
+
+async def __probe(session, url, retries, backoff):
+    """
+    Check the reachability of a URL with a HEAD request, falling back to a GET of its
+    first byte when the server does not support HEAD.
+
+    Returns:
+    --------
+    tuple
+        The URL, the final status code (None if no response), the latency in seconds and
+        the error of the last attempt (None if there was a response).
+    """
+    import aiohttp
+
+    for attempt in range(retries + 1):
+        started = time.perf_counter()
+        status = error = None
+        try:
+            async with session.head(url, allow_redirects=True) as response:
+                status = response.status
+            if status in (405, 501):
+                headers = {"Range": "bytes=0-0"}
+                async with session.get(url, headers=headers) as response:
+                    status = response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exception:
+            error = f"{type(exception).__name__}: {exception}".rstrip(": ")
+        latency = time.perf_counter() - started
+
+        # server errors and failed connections may be transient
+        if (status is not None and status < 500) or attempt == retries:
+            return url, status, latency, error
+        await asyncio.sleep(backoff * 2**attempt)
+
+
+def __probe_blocking(session, url, timeout, retries, backoff):
+    """
+    Check the reachability of a URL like `__probe`, with a blocking session.
+    """
+    for attempt in range(retries + 1):
+        started = time.perf_counter()
+        status = error = None
+        try:
+            with session.head(url, allow_redirects=True, timeout=timeout) as response:
+                status = response.status_code
+            if status in (405, 501):
+                headers = {"Range": "bytes=0-0"}
+                with session.get(
+                    url, headers=headers, timeout=timeout, stream=True
+                ) as response:
+                    status = response.status_code
+        except requests.RequestException as exception:
+            error = f"{type(exception).__name__}: {exception}".rstrip(": ")
+        latency = time.perf_counter() - started
+
+        # server errors and failed connections may be transient
+        if (status is not None and status < 500) or attempt == retries:
+            return url, status, latency, error
+        time.sleep(backoff * 2**attempt)
+
+
+async def __probe_all(urls, concurrency, per_host, timeout, retries, backoff):
+    """
+    Check the reachability of URLs with at most `concurrency` requests in flight.
+    """
+    import aiohttp
+
+    results = [None] * len(urls)
+    pending = iter(enumerate(urls))
+
+    async def worker(session):
+        for index, url in pending:
+            results[index] = await __probe(session, url, retries, backoff)
+
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=per_host)
+    async with aiohttp.ClientSession(
+        connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)
+    ) as session:
+        workers = min(concurrency, len(urls))
+        await asyncio.gather(*(worker(session) for _ in range(workers)))
+    return results
+
+
+def __run(coroutine):
+    """
+    Run a coroutine to completion, in a separate thread if an event loop is already
+    running in this one (e.g. in a Jupyter notebook).
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = asyncio.run(coroutine)
+        except BaseException as exception:
+            outcome["error"] = exception
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+def check_reachability(
+    urls,
+    concurrency=REACHABILITY_CONCURRENCY,
+    per_host=REACHABILITY_PER_HOST,
+    timeout=REACHABILITY_TIMEOUT,
+    retries=REACHABILITY_RETRIES,
+    backoff=0.5,
+    backend="async",
+):
+    """
+    Check the reachability of many URLs concurrently.
+
+    Each URL is checked with a HEAD request, or a GET of its first byte if the server does
+    not support HEAD, so no dataset is downloaded. The requests share a pool of keep-alive
+    connections. Duplicate URLs are checked once.
+
+    Parameters:
+    -----------
+    urls : iterable of str
+        The URLs to check.
+    concurrency : int
+        The maximum number of requests in flight.
+    per_host : int
+        The maximum number of requests in flight to the same host.
+    timeout : float
+        The number of seconds a request may take.
+    retries : int
+        The number of times a request is retried after a failed connection, a timeout or a
+        server error (5xx).
+    backoff : float
+        The number of seconds to wait before the first retry, doubled for each retry.
+    backend : str
+        "async" to send the requests from an event loop, or "threads" or "serial" to send
+        them with `requests` from `concurrency` threads or one at a time, see
+        `parallel_map()`. `per_host` only applies to "async".
+
+    Returns:
+    --------
+    pandas DataFrame
+        One row per unique URL with the columns "url", "status" (the final status code, or
+        <NA> if the server could not be reached), "reachable", "latency" (in seconds, of the
+        last attempt) and "error".
+
+    Note:
+    -----
+    The "async" backend requires `aiohttp`. A URL is reachable if its final status code is
+    2xx.
+    """
+    if backend not in ("async", "threads", "serial"):
+        raise ValueError(f"Error: Unsupported backend {backend}")
+
+    urls = list(dict.fromkeys(urls))
+    results = []
+    if urls and backend == "async":
+        results = __run(
+            __probe_all(urls, concurrency, per_host, timeout, retries, backoff)
+        )
+    elif urls:
+        with requests.Session() as session:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            results = parallel_map(
+                lambda url: __probe_blocking(session, url, timeout, retries, backoff),
+                urls,
+                backend,
+                concurrency,
+            )
+
+    results = pd.DataFrame(results, columns=["url", "status", "latency", "error"])
+    results["status"] = results["status"].astype("Int64")
+    results.insert(
+        2, "reachable", results["status"].between(200, 299).fillna(False).astype(bool)
+    )
+    return results
+
+
+def __connect_reachability(cache_directory=None):
+    """
+    Open the reachability database in the cache directory, creating its tables if needed.
+
+    The "reachability" table holds the latest result of each URL and the fingerprint of its
+    inventory rows. The "reachability_history" table holds every result.
+    """
+    database = Path(cache_directory or CACHE_DIRECTORY) / REACHABILITY_DATABASE
+    database.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(database)
+    connection.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS reachability (
+            url TEXT PRIMARY KEY,
+            status INTEGER,
+            reachable INTEGER NOT NULL,
+            latency REAL,
+            error TEXT,
+            checked_at REAL NOT NULL,
+            fingerprint TEXT
+        );
+        CREATE TABLE IF NOT EXISTS reachability_history (
+            url TEXT NOT NULL,
+            status INTEGER,
+            reachable INTEGER NOT NULL,
+            latency REAL,
+            error TEXT,
+            checked_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS reachability_history_url
+            ON reachability_history (url, checked_at);
+        """
+    )
+    return connection
+
+
+def __fingerprint_rows(df):
+    """
+    Get a fingerprint of the inventory rows of each URL, which changes when the columns
+    of REACHABILITY_FINGERPRINT_COLUMNS of any of the rows are modified. Other columns
+    are ignored, so the fingerprint does not depend on which of them were loaded.
+    """
+    columns = [column for column in REACHABILITY_FINGERPRINT_COLUMNS if column in df]
+    hashes = pd.util.hash_pandas_object(df[columns].astype(object), index=False)
+    hashes = pd.Series(hashes.to_numpy(), index=df["URL"].to_numpy())
+    hashes = hashes[hashes.index.notna()]
+    # sum the hashes, with wraparound, so the fingerprint ignores the order of the rows
+    return hashes.groupby(level=0, sort=False).sum().astype(str)
+
+
+def __read_reachability(connection, table, urls=None):
+    """
+    Read reachability results as a DataFrame.
+    """
+    query = f"SELECT * FROM {table}"
+    if urls is None:
+        data = pd.read_sql_query(query, connection)
+    else:
+        connection.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (url TEXT)")
+        connection.execute("DELETE FROM wanted")
+        connection.executemany(
+            "INSERT INTO wanted VALUES (?)", ((url,) for url in urls)
+        )
+        data = pd.read_sql_query(
+            f"{query} WHERE url IN (SELECT url FROM wanted)", connection
+        )
+
+    data["status"] = data["status"].astype("Int64")
+    data["reachable"] = data["reachable"].astype(bool)
+    data["checked_at"] = pd.to_datetime(data["checked_at"], unit="s", utc=True)
+    return data
+
+
+def cached_reachability(
+    df, ttl=REACHABILITY_TTL, cache_directory=None, refresh=False, **options
+):
+    """
+    Get the reachability of the dataset URLs, only checking the URLs that are stale.
+
+    The results are kept in a SQLite database in the cache directory, keyed by URL. A URL is
+    checked again if it has never been checked, if its last check is older than `ttl`
+    seconds, or if its rows of the inventory were added or modified since its last check.
+    Every check is also appended to a history, see `reachability_history`.
+
+    Parameters:
+    -----------
+    df : pandas DataFrame
+        The inventory, with a column named "URL".
+    ttl : float
+        The number of seconds after which a result is checked again.
+    cache_directory : str or None
+        The directory holding the database. Defaults to CACHE_DIRECTORY.
+    refresh : bool
+        If True, check every URL regardless of its cached result.
+    **options
+        Options passed to `check_reachability`, such as `concurrency` or `timeout`.
+
+    Returns:
+    --------
+    pandas DataFrame
+        One row per unique URL with the columns of `check_reachability`, "checked_at" (the
+        time of the last check, in UTC) and "cached" (False if the URL was checked by this
+        call).
+    """
+    fingerprints = __fingerprint_rows(df)
+    with __connect_reachability(cache_directory) as connection:
+        cached = __read_reachability(connection, "reachability", fingerprints.index)
+        cached = cached.set_index("url").reindex(fingerprints.index)
+
+        expires = pd.Timestamp.now(tz="UTC") - pd.Timedelta(seconds=ttl)
+        stale = (
+            cached["checked_at"].isna()
+            | (cached["checked_at"] < expires)
+            | (cached["fingerprint"] != fingerprints)
+        )
+        if refresh:
+            stale[:] = True
+
+        urls = stale.index[stale.to_numpy()]
+        if len(urls):
+            print(f"Checking the reachability of {len(urls)} URLs")
+        results = check_reachability(urls, **options)
+        results["checked_at"] = time.time()
+        results["fingerprint"] = fingerprints.reindex(results["url"]).to_numpy()
+
+        records = [
+            (
+                url,
+                None if pd.isna(status) else int(status),
+                int(reachable),
+                latency,
+                error if isinstance(error, str) else None,
+                checked_at,
+                fingerprint,
+            )
+            for url, status, reachable, latency, error, checked_at, fingerprint in (
+                results.itertuples(index=False, name=None)
+            )
+        ]
+        connection.executemany(
+            "INSERT OR REPLACE INTO reachability VALUES (?, ?, ?, ?, ?, ?, ?)", records
+        )
+        connection.executemany(
+            "INSERT INTO reachability_history VALUES (?, ?, ?, ?, ?, ?)",
+            (record[:-1] for record in records),
+        )
+
+        results = __read_reachability(connection, "reachability", fingerprints.index)
+    connection.close()
+
+    results = results.set_index("url").reindex(fingerprints.index)
+    results = results.rename_axis("url").reset_index()
+    results["cached"] = ~results["url"].isin(urls)
+    return results.drop(columns="fingerprint")
+
+
+def reachability_history(urls=None, cache_directory=None):
+    """
+    Get every reachability check recorded by `cached_reachability`.
+
+    Parameters:
+    -----------
+    urls : iterable of str or None
+        The URLs whose checks are returned, or None for all of them.
+    cache_directory : str or None
+        The directory holding the database. Defaults to CACHE_DIRECTORY.
+
+    Returns:
+    --------
+    pandas DataFrame
+        One row per check with the columns "url", "status", "reachable", "latency", "error"
+        and "checked_at", sorted by time.
+    """
+    with __connect_reachability(cache_directory) as connection:
+        history = __read_reachability(connection, "reachability_history", urls)
+    connection.close()
+    return history.sort_values("checked_at", kind="stable", ignore_index=True)
+
+
+def __sampling_order(strata, seed=None):
+    """
+    Get an order of the rows such that every prefix is a random sample stratified with
+    proportional allocation: the i-th of the N_h shuffled rows of stratum h is placed at
+    (i + u) / N_h, where u is a random offset of the stratum. The first row of every
+    stratum is moved ahead of all the others, so the first prefix holding as many rows
+    as there are strata samples each of them once.
+    """
+    generator = np.random.default_rng(seed)
+    codes, uniques = pd.factorize(strata, use_na_sentinel=False)
+    sizes = np.bincount(codes)
+    shuffled = generator.permutation(len(codes))
+    ranks = np.empty(len(codes))
+    ranks[shuffled] = pd.Series(codes[shuffled]).groupby(codes[shuffled]).cumcount()
+    positions = (ranks + generator.random(len(sizes))[codes]) / sizes[codes]
+    positions[ranks == 0] -= 1
+    return np.argsort(positions, kind="stable")
+
+
+def __stratified_estimate(population, sampled, reachable, z):
+    """
+    Estimate the reachable fraction and the half-width of its confidence interval from a
+    stratified sample.
+
+    Strata without a sampled row are left out and the weights of the others are
+    renormalized. The variance of each stratum uses (x + 1) / (n + 2) rather than the
+    sample proportion, so strata where every sampled URL is (un)reachable do not report a
+    zero variance, and includes the finite population correction.
+    """
+    covered = sampled > 0
+    weights = population[covered] / population[covered].sum()
+    n = sampled[covered]
+    proportions = reachable[covered] / n
+    adjusted = (reachable[covered] + 1) / (n + 2)
+    variance = (
+        weights**2
+        * (1 - n / population[covered])
+        * adjusted
+        * (1 - adjusted)
+        / np.maximum(n - 1, 1)
+    )
+    return float((weights * proportions).sum()), z * float(np.sqrt(variance.sum()))
+
+
+def estimate_reachability(
+    df,
+    strata="affiliation",
+    precision=0.01,
+    confidence=0.95,
+    batch_size=500,
+    max_samples=None,
+    seed=None,
+    **options,
+):
+    """
+    Estimate the fraction of reachable datasets from a stratified random sample.
+
+    Datasets are sampled in batches, with each stratum represented in proportion to its
+    size once every stratum was sampled at least once, and checked with
+    `check_reachability`. Once every stratum was sampled, sampling stops as soon as the
+    half-width of the confidence interval is at most `precision`. It also stops when
+    `max_samples` datasets were sampled, or when every dataset was checked.
+
+    Parameters:
+    -----------
+    df : pandas DataFrame
+        The inventory, with a column named "URL".
+    strata : str or None
+        The column whose values define the strata, such as "affiliation", "project" or
+        "generalmodality", "host" to stratify by the host of the URL, or None for a simple
+        random sample. Datasets without a value form a stratum of their own.
+    precision : float
+        The requested half-width of the confidence interval.
+    confidence : float
+        The confidence level of the interval.
+    batch_size : int
+        The number of datasets sampled between two estimates.
+    max_samples : int or None
+        The maximum number of datasets sampled.
+    seed : int or None
+        The seed of the random number generator.
+    **options
+        Options passed to `check_reachability`, such as `concurrency` or `timeout`.
+
+    Returns:
+    --------
+    dict
+        The "estimate" of the reachable fraction, the "lower" and "upper" bounds of its
+        confidence interval, the "confidence" level, the number of datasets "sampled" and of
+        URLs "checked", the "population" size, and "strata", a DataFrame with the
+        "population", "sampled" and "reachable" datasets of each stratum.
+    """
+    if strata == "host" and "host" not in df.columns:
+        labels = df["URL"].map(lambda url: urlsplit(url).netloc, na_action="ignore")
+    elif strata is None:
+        labels = pd.Series(0, index=df.index)
+    else:
+        labels = df[strata]
+    labels = labels.astype(object).to_numpy()
+
+    order = __sampling_order(labels, seed)
+    codes, uniques = pd.factorize(labels, use_na_sentinel=False)
+    population = np.bincount(codes).astype(float)
+    sampled = np.zeros(len(population))
+    reachable = np.zeros(len(population))
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+    limit = len(order) if max_samples is None else min(max_samples, len(order))
+    urls = df["URL"].to_numpy()
+    checked = {}
+    estimate, error = float("nan"), float("inf")
+    for start in range(0, limit, batch_size):
+        batch = order[start : min(start + batch_size, limit)]
+        unchecked = [
+            url for url in urls[batch] if isinstance(url, str) and url not in checked
+        ]
+        results = check_reachability(unchecked, **options)
+        checked.update(zip(results["url"], results["reachable"]))
+
+        hits = np.array([checked.get(url, False) for url in urls[batch]], dtype=float)
+        sampled += np.bincount(codes[batch], minlength=len(population))
+        reachable += np.bincount(codes[batch], hits, minlength=len(population))
+        estimate, error = __stratified_estimate(population, sampled, reachable, z)
+        # strata that were not sampled yet are missing from the estimate
+        if error <= precision and sampled.all():
+            break
+
+    return {
+        "estimate": estimate,
+        "lower": max(estimate - error, 0.0),
+        "upper": min(estimate + error, 1.0),
+        "confidence": confidence,
+        "sampled": int(sampled.sum()),
+        "checked": len(checked),
+        "population": len(df),
+        "strata": pd.DataFrame(
+            {
+                "population": population.astype(int),
+                "sampled": sampled.astype(int),
+                "reachable": reachable.astype(int),
+            },
+            index=pd.Index(uniques, name=strata),
+        ),
+    }
+
+
+def __are_reachable(df, cache=True, sample=False, **options):
+    """
+    Compute the reachability of datasets specified in the DataFrame.
+
+    This method checks the reachability of each dataset URL in the "URL" column of the DataFrame
+    with `check_reachability`, which sends lightweight concurrent requests and checks each
+    unique URL once. The reachability of each URL is stored in a new column named "is_reachable"
+    in the DataFrame. The method then returns the ratio of reachable datasets to the total number
+    of datasets.
+
+    Parameters:
+    -----------
+    df : pandas DataFrame
+        The input DataFrame containing a column named "URL" with dataset URLs to be checked.
+    cache : bool
+        If True, use `cached_reachability` so only new, modified or stale URLs are checked.
+    sample : bool
+        If True, only check a stratified random sample of the URLs with
+        `estimate_reachability` and return the estimated ratio. The DataFrame is not
+        modified.
+    **options
+        Options passed to `estimate_reachability`, `cached_reachability` or
+        `check_reachability`, such as `precision`, `ttl` or `concurrency`.
+
+    Returns:
+    --------
+    float
+        The ratio of reachable datasets to the total number of datasets.
+    """
+    if sample:
+        print("Estimating what fraction of datasets are reachable")
+        return estimate_reachability(df, **options)["estimate"]
+
     print("Computing what datasets are reachable")
-    df["is_reachable"] = df["URL"].parallel_apply(__is_it_reachable)
+    if cache:
+        results = cached_reachability(df, **options)
+    else:
+        # the options of the cache do not apply
+        for option in ("ttl", "cache_directory", "refresh"):
+            options.pop(option, None)
+        results = check_reachability(df["URL"].dropna(), **options)
+    reachable = dict(zip(results["url"], results["reachable"]))
+    df["is_reachable"] = df["URL"].map(reachable).fillna(False).astype(bool)
     return df["is_reachable"].sum() / len(df)
 
 
@@ -613,7 +2660,7 @@ def __get_metadata_version(df):
     the occurrences of each unique metadata version and returns the result as a dictionary.
     """
 
-    return df["metadata_version"].value_counts().to_dict()
+    return __count_values(df["metadata_version"]).to_dict()
 
 
 def __get_genotypes(df):
@@ -642,7 +2689,7 @@ def __get_genotypes(df):
     representing different genotypes. The function counts the occurrences of each unique genotype
     and returns the result as a dictionary.
     """
-    return df["genotype"].value_counts().to_dict()
+    return __count_values(df["genotype"]).to_dict()
 
 
 def __get_contributor(df):
@@ -671,7 +2718,7 @@ def __get_contributor(df):
     representing different contributors. The function counts the occurrences of each unique contributor
     and returns the result as a dictionary.
     """
-    return df["contributor"].value_counts().to_dict()
+    return __count_values(df["contributor"]).to_dict()
 
 
 def __get_affilation(df):
@@ -700,7 +2747,7 @@ def __get_affilation(df):
     representing different affiliations. The function counts the occurrences of each unique affiliation
     and returns the result as a dictionary.
     """
-    return df["affiliation"].value_counts().to_dict()
+    return __count_values(df["affiliation"]).to_dict()
 
 
 def __get_awards(df):
@@ -756,7 +2803,7 @@ def __get_award_number(df):
     representing different award numbers. The function counts the occurrences of each unique award number
     and returns the result as a dictionary.
     """
-    return df["award_number"].value_counts().to_dict()
+    return __count_values(df["award_number"]).to_dict()
 
 
 def __get_species(df):
@@ -785,7 +2832,7 @@ def __get_species(df):
     representing different species. The function counts the occurrences of each unique species
     and returns the result as a dictionary.
     """
-    return df["species"].value_counts().to_dict()
+    return __count_values(df["species"]).to_dict()
 
 
 def __get_ncbitaxonomy(df):
@@ -814,10 +2861,10 @@ def __get_ncbitaxonomy(df):
     representing different NCBI taxonomies. The function counts the occurrences of each unique NCBI taxonomy
     and returns the result as a dictionary.
     """
-    return df["ncbitaxonomy"].value_counts().to_dict()
+    return __count_values(df["ncbitaxonomy"]).to_dict()
 
 
-def __get_genotypes(df):
+def __get_unique_genotypes(df):
     """
     Get unique genotypes from the DataFrame.
 
@@ -834,6 +2881,29 @@ def __get_genotypes(df):
     return df["genotype"].unique()
 
 
+def __get_samplelocalid(df):
+    """
+    Get a dictionary containing the count of occurrences of each unique sample local ID.
+
+    This function takes a pandas DataFrame `df` as input and counts the occurrences of each
+    unique value in the "samplelocalid" column. The result is returned as a dictionary, where
+    the keys represent unique sample local IDs, and the values represent the count of
+    occurrences for each sample local ID.
+
+    Parameters:
+    -----------
+    df : pandas DataFrame
+        The input DataFrame containing a column named "samplelocalid".
+
+    Returns:
+    --------
+    dict
+        A dictionary where the keys represent unique sample local IDs, and the values represent
+        the count of occurrences for each sample local ID.
+    """
+    return __count_values(df["samplelocalid"]).to_dict()
+
+
 def __get_genotype_frequency(df):
     """
     Get a dictionary containing the count of occurrences of each unique genotype.
@@ -860,7 +2930,7 @@ def __get_genotype_frequency(df):
     representing different genotypes. The function counts the occurrences of each unique genotype
     and returns the result as a dictionary.
     """
-    return df["genotypes"].value_counts().to_dict()
+    return __count_values(df["genotypes"]).to_dict()
 
 
 def __get_generalmodality(df):
@@ -889,7 +2959,7 @@ def __get_generalmodality(df):
     representing different general modalities. The function counts the occurrences of each unique general
     modality and returns the result as a dictionary.
     """
-    return df["generalmodality"].value_counts().to_dict()
+    return __count_values(df["generalmodality"]).to_dict()
 
 
 def __get_techniques(df):
@@ -917,7 +2987,7 @@ def __get_techniques(df):
     representing different techniques. The function counts the occurrences of each unique technique
     and returns the result as a dictionary.
     """
-    return df["technique"].value_counts().to_dict()
+    return __count_values(df["technique"]).to_dict()
 
 
 def __get_award_numbers(df):
@@ -946,7 +3016,7 @@ def __get_award_numbers(df):
     representing different award numbers. The function counts the occurrences of each unique award number
     and returns the result as a dictionary.
     """
-    return df["award_number"].value_counts().to_dict()
+    return __count_values(df["award_number"]).to_dict()
 
 
 def __get_affiliations(df):
@@ -971,7 +3041,7 @@ def __get_affiliations(df):
     The input DataFrame `df` should have a column named "affiliation" containing
     categorical data, where the function will count the occurrences of each unique value.
     """
-    return df["affiliation"].value_counts().to_dict()
+    return __count_values(df["affiliation"]).to_dict()
 
 
 def __get_contributors(df):
@@ -1001,7 +3071,7 @@ def __get_contributors(df):
     representing different contributor names. The function counts the occurrences of each unique
     contributor name and returns the result as a dictionary.
     """
-    return df["contributorname"].value_counts().to_dict()
+    return __count_values(df["contributorname"]).to_dict()
 
 
 def __get_projects(df):
@@ -1064,40 +3134,356 @@ def techniques_frequency(df):
     representing different techniques. The function counts the occurrences of each unique technique
     and returns the result as a dictionary.
     """
-    return df["technique"].value_counts().to_dict()
+    return __count_values(df["technique"]).to_dict()
+
+
+def __get_locations(df):
+    """
+    Get a dictionary containing the count of occurrences of each unique location.
+
+    This function takes a pandas DataFrame `df` as input and counts the occurrences of each
+    unique value in the "locations" column. The result is returned as a dictionary, where the
+    keys represent unique locations, and the values represent the count of occurrences for
+    each location.
+
+    Parameters:
+    -----------
+    df : pandas DataFrame
+        The input DataFrame containing a column named "locations" with location information.
+
+    Returns:
+    --------
+    dict
+        A dictionary where the keys represent unique locations, and the values represent
+        the count of occurrences for each location.
+
+
+    Note:
+    -----
+    The input DataFrame `df` should have a column named "locations" containing categorical data
+    representing different locations. The function counts the occurrences of each unique location
+    and returns the result as a dictionary.
+    """
+    return __count_values(df["locations"]).to_dict()
+
+
+def __place_key(place):
+    """
+    Get the key of a place in the gazetteer and the geocoding cache, which ignores case and
+    repeated whitespace.
+    """
+    return " ".join(str(place).split()).casefold()
+
+
+def load_gazetteer(filename):
+    """
+    Load an offline gazetteer, used to locate places without a geocoding service.
+
+    Parameters:
+    -----------
+    filename : str or pathlib.Path
+        A CSV file with the columns "place", "latitude" and "longitude", with one row per
+        place, e.g. "Pittsburgh, PA,40.4406,-79.9959" (quoted as needed).
+
+    Returns:
+    --------
+    pandas DataFrame
+        The columns "latitude" and "longitude", indexed by the key of each place.
+
+    Raises:
+    -------
+    ValueError
+        If a column is missing from the file.
+    """
+    gazetteer = pd.read_csv(filename)
+    missing = {"place", "latitude", "longitude"} - set(gazetteer.columns)
+    if missing:
+        raise ValueError(
+            f"Error: The gazetteer {filename} has no column {', '.join(sorted(missing))}"
+        )
+
+    gazetteer = gazetteer.dropna(subset=["place", "latitude", "longitude"])
+    gazetteer.index = gazetteer["place"].map(__place_key)
+    gazetteer = gazetteer[~gazetteer.index.duplicated()]
+    return gazetteer[["latitude", "longitude"]].astype("float64")
+
+
+def __connect_geocoding(cache_directory=None):
+    """
+    Open the geocoding database in the cache directory, creating its table if needed.
+
+    The "geocoding" table holds the coordinates of each place looked up online, keyed by
+    the key of the place. The coordinates are NULL if the place was not found.
+    """
+    database = Path(cache_directory or CACHE_DIRECTORY) / GEOCODING_DATABASE
+    database.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(database)
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS geocoding (
+            place TEXT PRIMARY KEY,
+            latitude REAL,
+            longitude REAL,
+            address TEXT,
+            geocoded_at REAL NOT NULL
+        )
+        """
+    )
+    return connection
+
+
+def __read_geocoding(connection, keys):
+    """
+    Read the cached coordinates of places as a DataFrame indexed by their keys.
+    """
+    connection.execute("CREATE TEMP TABLE IF NOT EXISTS wanted_places (place TEXT)")
+    connection.execute("DELETE FROM wanted_places")
+    connection.executemany(
+        "INSERT INTO wanted_places VALUES (?)", ((key,) for key in keys)
+    )
+    data = pd.read_sql_query(
+        "SELECT place, latitude, longitude FROM geocoding "
+        "WHERE place IN (SELECT place FROM wanted_places)",
+        connection,
+    )
+    return data.set_index("place")
+
+
+def geocode(
+    places,
+    gazetteer=None,
+    cache_directory=None,
+    online=True,
+    refresh=False,
+    geocoder=None,
+    min_delay_seconds=GEOCODING_DELAY,
+):
+    """
+    Get the coordinates of places, looking up each unique place at most once.
+
+    A place is looked up in the gazetteer first, then in the geocoding cache, a SQLite
+    database in the cache directory, and only then with a geocoding service, by default
+    Nominatim (OpenStreetMap) at most once every `min_delay_seconds` as its usage policy
+    requires. Results of the service, including places it did not find, are saved to the
+    cache as soon as they are received, so once the places of an inventory are cached they
+    are located without network access. Places are compared ignoring case and repeated
+    whitespace.
+
+    Parameters:
+    -----------
+    places : iterable of str
+        The places, e.g. the "locations" or "affiliation" column of the inventory.
+        Duplicates and missing values are ignored.
+    gazetteer : str, pathlib.Path, pandas DataFrame or None
+        An offline gazetteer, or its CSV file, see `load_gazetteer()`.
+    cache_directory : str or None
+        The directory holding the database. Defaults to CACHE_DIRECTORY.
+    online : bool
+        Whether to look up the places that are neither in the gazetteer nor cached with
+        the geocoding service.
+    refresh : bool
+        If True, look up every place that is not in the gazetteer with the geocoding
+        service regardless of its cached result.
+    geocoder : geopy geocoder or None
+        The geocoding service. Defaults to Nominatim with the user agent
+        GEOCODING_USER_AGENT.
+    min_delay_seconds : float
+        The minimum number of seconds between two requests to the geocoding service.
+
+    Returns:
+    --------
+    pandas DataFrame
+        One row per unique place with the columns "place", "latitude", "longitude" and
+        "source", which is "gazetteer", "cache", "geocoder", or None if the place could not
+        be located.
+    """
+    places = pd.Series(list(places), dtype=object).dropna().astype(str).unique()
+    keys = pd.Index([__place_key(place) for place in places])
+    results = pd.DataFrame(
+        {
+            "place": places,
+            "latitude": np.nan,
+            "longitude": np.nan,
+            "source": pd.Series([None] * len(places), dtype=object),
+        },
+        index=keys,
+    )
+    results = results[(results.index != "") & ~results.index.duplicated()]
+
+    def update(found, source):
+        found = found.dropna(subset=["latitude", "longitude"])
+        found = found[found.index.isin(results.index[results["source"].isna()])]
+        if len(found):
+            results.loc[found.index, ["latitude", "longitude"]] = found[
+                ["latitude", "longitude"]
+            ].to_numpy(dtype="float64")
+            results.loc[found.index, "source"] = source
+
+    if gazetteer is not None:
+        if not isinstance(gazetteer, pd.DataFrame):
+            gazetteer = load_gazetteer(gazetteer)
+        update(gazetteer, "gazetteer")
+
+    with __connect_geocoding(cache_directory) as connection:
+        cached = __read_geocoding(connection, results.index)
+        if not refresh:
+            update(cached, "cache")
+            missing = results.index[
+                results["source"].isna() & ~results.index.isin(cached.index)
+            ]
+        else:
+            missing = results.index[results["source"].isna()]
+
+        if online and len(missing):
+            from geopy.exc import GeopyError
+            from geopy.extra.rate_limiter import RateLimiter
+
+            if geocoder is None:
+                from geopy.geocoders import Nominatim
+
+                geocoder = Nominatim(user_agent=GEOCODING_USER_AGENT)
+            lookup = RateLimiter(
+                geocoder.geocode,
+                min_delay_seconds=min_delay_seconds,
+                swallow_exceptions=False,
+            )
+
+            print(f"Geocoding {len(missing)} places")
+            for key in missing:
+                try:
+                    location = lookup(results.at[key, "place"])
+                except GeopyError as error:
+                    # not cached, so the place is looked up again next time
+                    print(
+                        f"Warning: Unable to geocode {results.at[key, 'place']}: {error}"
+                    )
+                    continue
+
+                record = (key, None, None, None, time.time())
+                if location is not None:
+                    record = (
+                        key,
+                        location.latitude,
+                        location.longitude,
+                        location.address,
+                        time.time(),
+                    )
+                    results.loc[key, ["latitude", "longitude"]] = record[1:3]
+                    results.at[key, "source"] = "geocoder"
+                connection.execute(
+                    "INSERT OR REPLACE INTO geocoding VALUES (?, ?, ?, ?, ?)", record
+                )
+                connection.commit()
+    connection.close()
+
+    return results.reset_index(drop=True)
+
+
+def location_counts(df, column="locations", **options):
+    """
+    Count the datasets at each location.
+
+    The values of the column are counted first and only the unique values are geocoded,
+    so the cost depends on the number of places, not on the number of datasets. Places
+    with the same coordinates are merged.
+
+    Parameters:
+    -----------
+    df : pandas DataFrame or LazyInventory
+        The inventory.
+    column : str
+        The column holding the places, e.g. "locations" or "affiliation".
+    **options
+        Options passed to `geocode()`, such as `gazetteer` or `online`.
+
+    Returns:
+    --------
+    pandas DataFrame
+        One row per location with the columns "latitude", "longitude", "count" (the
+        number of datasets) and "places" (the list of places at the location), in
+        descending order of count. The datasets of places that could not be located are
+        left out.
+    """
+    counts = __count_values(df[column])
+    coordinates = geocode(counts.index, **options)
+
+    located = coordinates.dropna(subset=["latitude", "longitude"])
+    unlocated = len(coordinates) - len(located)
+    if unlocated:
+        print(f"Warning: Unable to locate {unlocated} of {len(coordinates)} places")
+
+    # places that only differ in case or whitespace were geocoded once, under one spelling
+    counts = counts.groupby([__place_key(place) for place in counts.index]).sum()
+    keys = [__place_key(place) for place in located["place"]]
+    located = located.assign(count=counts.reindex(keys).to_numpy())
+    located = located.groupby(
+        ["latitude", "longitude"], as_index=False, sort=False
+    ).agg(count=("count", "sum"), places=("place", list))
+    return located.sort_values(
+        "count", ascending=False, kind="stable", ignore_index=True
+    )
 
 
-def __get_locations(df):
+def create_locations_map(df, column="locations", filename=None, **options):
     """
-    Get a dictionary containing the count of occurrences of each unique location.
+    Create a map of the number of datasets at each location.
 
-    This function takes a pandas DataFrame `df` as input and counts the occurrences of each
-    unique value in the "locations" column. The result is returned as a dictionary, where the
-    keys represent unique locations, and the values represent the count of occurrences for
-    each location.
+    Every location is drawn as a circle whose area is proportional to its number of
+    datasets, see `location_counts()`, so the map holds one marker per unique place.
 
     Parameters:
     -----------
-    df : pandas DataFrame
-        The input DataFrame containing a column named "locations" with location information.
+    df : pandas DataFrame or LazyInventory
+        The inventory.
+    column : str
+        The column holding the places, e.g. "locations" or "affiliation".
+    filename : str or None
+        The HTML file the map is saved as. Defaults to "<column>-map-YYYYMMDD.html".
+    **options
+        Options passed to `geocode()`, such as `gazetteer` or `online`.
 
     Returns:
     --------
-    dict
-        A dictionary where the keys represent unique locations, and the values represent
-        the count of occurrences for each location.
-
-
-    Note:
-    -----
-    The input DataFrame `df` should have a column named "locations" containing categorical data
-    representing different locations. The function counts the occurrences of each unique location
-    and returns the result as a dictionary.
+    str
+        The name of the file the map is saved as.
     """
-    return df["locations"].value_counts().to_dict()
+    import html
+
+    import folium
+
+    points = location_counts(df, column, **options)
+    filename = filename or f'{column}-map-{date.today().strftime("%Y%m%d")}.html'
+
+    figure = folium.Map(location=[20, 0], zoom_start=2)
+    if len(points):
+        largest = points["count"].max()
+        for latitude, longitude, count, places in points.itertuples(
+            index=False, name=None
+        ):
+            popup = "<br>".join(html.escape(place) for place in places)
+            folium.CircleMarker(
+                location=[latitude, longitude],
+                radius=4 + 26 * np.sqrt(count / largest),
+                popup=folium.Popup(
+                    f"{popup}<br><b>{count} datasets</b>", max_width=300
+                ),
+                tooltip=f"{count} datasets",
+                fill=True,
+                fill_opacity=0.6,
+                weight=1,
+            ).add_to(figure)
+        figure.fit_bounds(
+            [
+                [points["latitude"].min(), points["longitude"].min()],
+                [points["latitude"].max(), points["longitude"].max()],
+            ]
+        )
 
+    figure.save(filename)
+    return filename
 
-def __get_contributors(df):
+
+def __get_unique_contributors(df):
     """
     Get a list of unique contributors from the input DataFrame.
 
@@ -1213,25 +3599,358 @@ def get_projects_treemap(df):
 
     Returns:
     --------
-    None
-        The function displays the treemap visualization using matplotlib.pyplot.
+    str
+        The name of the file the treemap is saved as.
 
     Note:
     -----
     The function calculates the counts of each unique project in the input DataFrame `df` and
     visualizes the relative proportions using a treemap plot. The size of each rectangle in the
-    treemap is proportional to the count of the corresponding project. The treemap is displayed
-    using the `squarify` and `matplotlib.pyplot` libraries. The plot is saved as a PNG file with a
+    treemap is proportional to the count of the corresponding project. The treemap is drawn
+    with the `squarify` library, without being displayed. The plot is saved as a PNG file with a
     filename formatted as "treemap-projects-YYYYMMDD.png", where "YYYYMMDD" represents the current
     date when the function is executed.
     """
-    df = df["project"].value_counts().to_dict()
-    sizes_list = list(df.values())
-    names_list = list(df.keys())
-    squarify.plot(sizes_list)
+    return create_projects_treemap(__count_values(df["project"]))
+
+
+def create_projects_treemap(project_counts, cache=True, cache_directory=None):
+    """
+    Generate a treemap visualization from precomputed project counts.
+
+    Parameters:
+    -----------
+    project_counts : pandas Series
+        The number of datasets of each project, indexed by project name.
+    cache : bool
+        Whether to reuse the treemap rendered from the same counts, see `render_figures()`.
+    cache_directory : str, pathlib.Path or None
+        The directory holding the plot cache. Defaults to CACHE_DIRECTORY.
+
+    Returns:
+    --------
+    str
+        The name of the file the treemap is saved as, "treemap-projects-YYYYMMDD.png".
+    """
+    filename = f'treemap-projects-{date.today().strftime("%Y%m%d")}.png'
+    __render_cached(
+        __render_projects_treemap, project_counts, [filename], cache, cache_directory
+    )
+    return filename
+
+
+def __save_figure(figure, filenames):
+    """
+    Save a figure to each file, in the format of its suffix, and release it.
+    """
+    for filename in filenames:
+        # the file may be a hard link to a cached figure, which must not be overwritten
+        Path(filename).unlink(missing_ok=True)
+        figure.savefig(filename)
+    figure.clear()
+
+
+def __plot_cache_paths(cache_directory, function, data, filenames):
+    """
+    Get the files caching a figure in the format of each of `filenames`.
+
+    The files are named after the SHA-1 digest of the renderer, the version of the
+    figures and the hash of the data the figure is drawn from, including its index and
+    columns, so a figure is only rendered again when its data change.
+    """
+    digest = hashlib.sha1(f"{function.__name__}\n{PLOT_CACHE_VERSION}".encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    if isinstance(data, pd.DataFrame):
+        digest.update(repr((list(data.columns), data.columns.name)).encode("utf-8"))
+    digest = digest.hexdigest()
+    directory = Path(cache_directory) / "plots"
+    return [directory / f"{digest}{Path(filename).suffix}" for filename in filenames]
+
+
+def __evict_plots(cache_directory, max_bytes=PLOT_CACHE_MAX_BYTES, keep=()):
+    """
+    Remove the least recently used figures until the plot cache fits in `max_bytes`.
+
+    Parameters:
+    -----------
+    cache_directory : str or pathlib.Path
+        The directory holding the cache, the figures are in its "plots" subdirectory.
+    max_bytes : int
+        The maximum total size of the cached figures. The most recently used figure is
+        always kept.
+    keep : list of pathlib.Path
+        The figures that are never removed, e.g. the ones just rendered or linked.
+    """
+    # figures being rendered are written to "<digest>-<pid>" files, left alone
+    figures = [
+        figure
+        for figure in (Path(cache_directory) / "plots").glob("*.*")
+        if "-" not in figure.stem
+    ]
+    __evict_files(figures, max_bytes, keep)
+
+
+def __link_file(source, destination):
+    """
+    Hard link a file to `destination`, or copy it where hard links are not supported.
+    """
+    destination = Path(destination)
+    destination.unlink(missing_ok=True)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+def __render_modality_bar(modality_counts, filenames):
+    """
+    Render the bar plot of the number of datasets of each general modality.
+    """
+    from matplotlib import colormaps
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(10, 6))
+    ax = figure.subplots()
+    ax.bar(
+        [str(name) for name in modality_counts.index],
+        modality_counts.to_numpy(),
+        color=colormaps["tab20c"].colors,
+        edgecolor="black",
+    )
+    ax.set_xlabel("General Modality", fontsize=12)
+    ax.set_ylabel("Frequency", fontsize=12)
+    ax.set_title("Frequency of General Modality", fontsize=14)
+    ax.tick_params(axis="x", labelrotation=45, labelsize=10)
+    ax.tick_params(axis="y", labelsize=10)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment("right")
+
+    figure.tight_layout()
+    __save_figure(figure, filenames)
+
+
+def __render_modality_treemap(modality_counts, filenames):
+    """
+    Render the treemap of the general modalities, labeled with their initials.
+    """
+    import seaborn as sb
+    import squarify
+    from matplotlib.figure import Figure
+    from matplotlib.patches import Rectangle
+
+    values = modality_counts.tolist()
+    name = [str(value) for value in modality_counts.index]
+    abbrName = __get_lable_dict(name)
+    colors = sb.color_palette("ocean", len(values))
+
+    figure = Figure(figsize=(14, 10))
+    ax = figure.subplots()
+    squarify.plot(sizes=values, color=colors, label=abbrName.values(), alpha=0.8, ax=ax)
+    ax.axis("off")
+    ax.invert_xaxis()
+    ax.set_aspect("equal")
+
+    legend_patches = [Rectangle((0, 0), 1, 1, fc=color) for color in colors]
+    ax.legend(
+        legend_patches, name, loc="upper left", bbox_to_anchor=(1, 1), fontsize="medium"
+    )
+    __save_figure(figure, filenames)
+
+
+def __render_projects_treemap(project_counts, filenames):
+    """
+    Render the treemap of the number of datasets of each project.
+    """
+    import squarify
+    from matplotlib.figure import Figure
+
+    figure = Figure()
+    squarify.plot(project_counts.tolist(), ax=figure.subplots())
+    __save_figure(figure, filenames)
+
+
+def __render_modality_by_year(counts, filenames):
+    """
+    Render the stacked bar graph of the number of datasets of each general modality per
+    year, from a DataFrame with a row per year and a column per modality.
+    """
+    from matplotlib import colormaps
+    from matplotlib.figure import Figure
+
+    figure = Figure()
+    ax = figure.subplots()
+    years = [str(year) for year in counts.index]
+    bottom = np.zeros(len(counts))
+    colors = colormaps["tab10"].colors
+    for index, modality in enumerate(counts.columns):
+        values = counts[modality].to_numpy(dtype=float)
+        color = colors[index % len(colors)]
+        ax.bar(years, values, bottom=bottom, label=str(modality), color=color)
+        bottom += values
+    ax.legend(title=counts.columns.name)
+
+    ax.set_title("General Modalities")
+    ax.set_ylabel("Number of Datasets")
+    ax.set_xlabel("Year")
+    ax.tick_params(axis="x", labelrotation=45)
+    figure.tight_layout()
+    __save_figure(figure, filenames)
+
+
+def __render(job):
+    """
+    Render a figure from a (function, data, filenames, cached) job and get its filenames.
+
+    `cached` are the files caching the figure, see `__plot_cache_paths()`, or None. The
+    figure is only rendered if they are missing, and the filenames are then linked to them.
+    Cached files that are reused are touched, so they are the last to be evicted.
+    """
+    function, data, filenames, cached = job
+    if cached is None:
+        function(data, filenames)
+        return filenames
+
+    if all(path.exists() for path in cached):
+        for path in cached:
+            os.utime(path)
+    else:
+        cached[0].parent.mkdir(parents=True, exist_ok=True)
+        temporaries = [
+            path.with_name(f"{path.stem}-{os.getpid()}{path.suffix}") for path in cached
+        ]
+        function(data, [str(temporary) for temporary in temporaries])
+        for temporary, path in zip(temporaries, cached):
+            os.replace(temporary, path)
+    for path, filename in zip(cached, filenames):
+        __link_file(path, filename)
+    return filenames
+
+
+def __render_cached(function, data, filenames, cache=True, cache_directory=None):
+    """
+    Render a figure, or link it from the plot cache if its data did not change.
+    """
+    cached = None
+    if cache:
+        cache_directory = cache_directory or CACHE_DIRECTORY
+        cached = __plot_cache_paths(cache_directory, function, data, filenames)
+    filenames = __render((function, data, filenames, cached))
+    if cached is not None:
+        __evict_plots(cache_directory, keep=cached)
+    return filenames
+
+
+def render_figures(
+    df=None,
+    directory=".",
+    formats=("png",),
+    backend="processes",
+    max_workers=None,
+    tdate=None,
+    cache=True,
+    cache_directory=None,
+    cache_max_bytes=PLOT_CACHE_MAX_BYTES,
+):
+    """
+    Render all the figures of the report.
+
+    The counts the figures are drawn from are computed first, once, and the figures are
+    then rendered concurrently, each on its own matplotlib `Figure` with the Agg renderer,
+    so nothing is shown and no pyplot state is shared or leaked. With the "processes"
+    backend, each worker only receives the counts of its figure.
+
+    Rendered figures are cached under the hash of their counts. A figure whose counts did
+    not change since it was last rendered, which is the case of most figures on most days,
+    is not rendered again: its file is hard linked (or copied) from the cache. Once the
+    cache exceeds `cache_max_bytes`, the least recently used figures are removed from it;
+    files already linked from them are not affected.
+
+    Parameters:
+    -----------
+    df : pandas DataFrame, LazyInventory, Report or None
+        The inventory, or its report. Defaults to today's inventory.
+    directory : str or pathlib.Path
+        The directory the figures are saved in.
+    formats : list of str
+        The formats each figure is saved in, e.g. ("png", "svg").
+    backend : str
+        "serial", "threads" or "processes", see `parallel_map()`.
+    max_workers : int or None
+        The number of threads or processes. Defaults to MAX_WORKERS.
+    tdate : datetime.date or None
+        The date of the report, in the names of the files. Defaults to today. Ignored if
+        `df` is a Report, whose date is used.
+    cache : bool
+        Whether to reuse the figures rendered from the same counts.
+    cache_directory : str, pathlib.Path or None
+        The directory holding the cache, the figures are in its "plots" subdirectory.
+        Defaults to CACHE_DIRECTORY.
+    cache_max_bytes : int
+        The maximum total size of the cached figures. The least recently used figures
+        are removed once it is exceeded.
+
+    Returns:
+    --------
+    dict
+        The files each figure is saved as, by figure: "general_modality",
+        "general_modality_treemap", "projects_treemap" and "general_modality_by_year".
+        Figures whose columns are missing from the inventory are left out.
+    """
+    report = df if isinstance(df, Report) else Report(df, tdate)
+    suffix = report.date
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    def filenames(name):
+        return [str(directory / f"{name}-{suffix}.{format}") for format in formats]
+
+    jobs = {}
+    if report._available("generalmodality"):
+        counts = report.counts("generalmodality")
+        jobs["general_modality"] = (
+            __render_modality_bar,
+            counts,
+            filenames("general-modality"),
+        )
+        jobs["general_modality_treemap"] = (
+            __render_modality_treemap,
+            counts,
+            filenames("treemap-general-modality"),
+        )
+    if report._available("project"):
+        jobs["projects_treemap"] = (
+            __render_projects_treemap,
+            report.counts("project"),
+            filenames("treemap-projects"),
+        )
+    if not report._state and all(
+        column in report.df for column in ("creation_date", "generalmodality")
+    ):
+        inventory = report.df[["creation_date", "generalmodality"]]
+        jobs["general_modality_by_year"] = (
+            __render_modality_by_year,
+            date_rollup(inventory, "generalmodality", "year"),
+            filenames("general-modality-by-year"),
+        )
+
+    cache_directory = cache_directory or CACHE_DIRECTORY
+    for name, (function, data, paths) in jobs.items():
+        cached = __plot_cache_paths(cache_directory, function, data, paths)
+        jobs[name] = (function, data, paths, cached if cache else None)
 
-    filename = f'treemap-projects-{datetime.now().strftime("%Y%m%d")}.png'
-    plt.savefig(filename)
+    # the cached figures are only linked, which is not worth a worker
+    pending = {
+        name: job
+        for name, job in jobs.items()
+        if job[3] is None or not all(path.exists() for path in job[3])
+    }
+    parallel_map(__render, pending.values(), backend, max_workers)
+    for name in jobs.keys() - pending.keys():
+        __render(jobs[name])
+    if cache:
+        used = [path for job in jobs.values() for path in job[3]]
+        __evict_plots(cache_directory, cache_max_bytes, keep=used)
+    return {name: job[2] for name, job in jobs.items()}
 
 
 def __get_modalities(df):
@@ -1248,7 +3967,7 @@ def __get_modalities(df):
     Returns:
         dict: A dictionary with modalities as keys and their corresponding counts as values.
     """
-    return (df["generalmodality"].value_counts()).to_dict()
+    return __count_values(df["generalmodality"]).to_dict()
 
 
 def __get__percentage_of_metadata_version_1(df):
@@ -1278,7 +3997,175 @@ def __get__percentage_of_metadata_version_1(df):
     return len(df[df["metadata_version"] == 1]) / len(df)
 
 
-def __get_similar_columns(df, column):
+def __qgram_tokens(text, q):
+    """
+    Get the q-grams of a string, numbering repeated q-grams so that the size of the
+    intersection of two sets of them is the size of the intersection of the multisets.
+    """
+    seen = Counter()
+    tokens = []
+    for start in range(len(text) - q + 1):
+        gram = text[start : start + q]
+        tokens.append((gram, seen[gram]))
+        seen[gram] += 1
+    return tokens
+
+
+def __character_counts(strings, columns=64):
+    """
+    Count the characters of each string, with a column for each of the most common
+    characters and a last column for all the others.
+    """
+    lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+    characters = np.frombuffer("".join(strings).encode("utf-32-le"), dtype=np.uint32)
+    common, frequency = np.unique(characters, return_counts=True)
+    common = np.sort(common[np.argsort(-frequency, kind="stable")[: columns - 1]])
+
+    positions = np.searchsorted(common, characters).clip(max=len(common) - 1)
+    found = common[positions] == characters if len(common) else positions < 0
+    counts = np.zeros((len(strings), columns), dtype=np.int64)
+    rows = np.repeat(np.arange(len(strings)), lengths)
+    np.add.at(counts, (rows, np.where(found, positions, columns - 1)), 1)
+    return counts
+
+
+def __similarity_index(values, threshold):
+    """
+    Build the index `__search_similar()` finds the strings similar to a string with.
+
+    If the ratio of strings a and b is above t, the M characters of their matching blocks
+    satisfy 2M > t(|a| + |b|), and k blocks are separated by at least k - 1 unmatched
+    characters, so a and b share at least M - (q - 1)k q-grams, which is positive for the
+    q chosen below unless both strings are short. The index therefore maps each of the
+    rarest q-grams of every string (its prefix) to the strings holding it, and keeps the
+    short strings apart, along with the lengths and character counts used to bound the
+    ratio of a pair.
+    """
+    # the bound on shared bigrams is only useful for thresholds above 2/3
+    q = 2 if threshold > 2 / 3 else 1
+    strings = [str(value).lower() for value in values]
+    lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+
+    # 2 min(|a|, |b|) / (|a| + |b|) is an upper bound of the ratio
+    shortest = lengths * threshold / (2 - threshold) - 1e-9
+    longest = lengths * (2 - threshold) / threshold + 1e-9
+    total = lengths + np.ceil(shortest)
+    bound = threshold * total / 2 - (q - 1) * ((1 - threshold) * total + 1)
+    overlaps = np.floor(bound - 1e-9).astype(np.int64) + 1
+    short = overlaps < 1
+
+    tokens = [__qgram_tokens(string, q) for string in strings]
+    frequency = Counter(token for string_tokens in tokens for token in string_tokens)
+    prefixes = []
+    postings = defaultdict(list)
+    for i, string_tokens in enumerate(tokens):
+        prefix = []
+        if not short[i]:
+            prefix = sorted(string_tokens, key=lambda token: (frequency[token], token))
+            prefix = prefix[: len(prefix) - overlaps[i] + 1]
+        for token in prefix:
+            postings[token].append(i)
+        prefixes.append(prefix)
+
+    return {
+        "threshold": threshold,
+        "strings": strings,
+        "lengths": lengths,
+        "counts": __character_counts(strings),
+        "shortest": shortest,
+        "longest": longest,
+        "short": short,
+        "prefixes": prefixes,
+        "postings": {token: np.array(members) for token, members in postings.items()},
+    }
+
+
+def __search_similar(index, is_query, queries):
+    """
+    Find the pairs of strings of the index including one of `queries` whose ratio is
+    above the threshold of the index, see `__similar_pairs()`. Pairs of two strings
+    flagged in `is_query` are only found from the first of the two.
+    """
+    threshold = index["threshold"]
+    strings, lengths, counts = index["strings"], index["lengths"], index["counts"]
+    shortest, longest, short = index["shortest"], index["longest"], index["short"]
+
+    def by_length(members):
+        members = members[np.argsort(lengths[members], kind="stable")]
+        return members, lengths[members]
+
+    def compatible(members, i):
+        # the members whose length allows a ratio above the threshold with string i
+        members, sorted_lengths = members
+        start = np.searchsorted(sorted_lengths, shortest[i], side="left")
+        stop = np.searchsorted(sorted_lengths, longest[i], side="right")
+        return members[start:stop]
+
+    everyone = by_length(np.arange(len(strings)))
+    short_ones = by_length(np.flatnonzero(short))
+
+    pairs = []
+    matcher = SequenceMatcher(None)
+    for i in queries:
+        if short[i]:
+            # short strings may be similar without sharing a q-gram
+            others = compatible(everyone, i)
+        else:
+            others = [index["postings"][token] for token in index["prefixes"][i]]
+            others = np.concatenate(others + [compatible(short_ones, i)])
+        others = np.unique(others[(others > i) | ~is_query[others]])
+        others = others[
+            (lengths[others] >= shortest[i]) & (lengths[others] <= longest[i])
+        ]
+        matches = np.minimum(counts[others], counts[i]).sum(axis=1)
+        totals = lengths[i] + lengths[others]
+        others = others[2 * matches >= threshold * totals - 1e-9]
+
+        for j in others.tolist():
+            first, second = min(i, j), max(i, j)
+            matcher.set_seqs(strings[first], strings[second])
+            similarity = matcher.ratio()
+            if similarity > threshold:
+                pairs.append((first, second, similarity))
+    return pairs
+
+
+def __similar_pairs(
+    values, threshold, queries=None, backend="serial", max_workers=None
+):
+    """
+    Find the pairs of strings whose `SequenceMatcher` ratio, ignoring case, is above the
+    threshold, without comparing every pair.
+
+    Strings are only compared when they share one of the rarest q-grams of each (prefix
+    filtering), and short strings with every string, see `__similarity_index()`.
+    Candidates whose lengths or character counts (`quick_ratio`) bound the ratio below
+    the threshold are dropped before computing the ratio, so the result is the same as
+    comparing every pair.
+
+    If `queries`, a list of indices into `values`, is given, only the pairs including one
+    of them are found. The index is built once. With a "threads" or "processes" backend,
+    the queries are split into chunks searched by separate workers, which each receive
+    the index with their chunk.
+
+    Returns:
+    --------
+    list
+        The (i, j, similarity) triples, with i < j indices into `values`, in order.
+    """
+    index = __similarity_index(values, threshold)
+    if queries is None:
+        queries = list(range(len(values)))
+    is_query = np.zeros(len(values), dtype=bool)
+    is_query[list(queries)] = True
+
+    search = partial(__search_similar, index, is_query)
+    return sorted(map_chunks(search, list(queries), backend, max_workers))
+
+
+def __get_similar_columns(
+    df, column, threshold=0.85, backend="serial", max_workers=None
+):
     """
       Return a list of similar column values. For example, the "affiliation" column might include
 
@@ -1286,26 +4173,112 @@ def __get_similar_columns(df, column):
     'University of California, Los Angeles (UCLA)',
     0.9135802469135802]]
 
+    Values are similar if their `difflib.SequenceMatcher` ratio, ignoring case, is above
+    `threshold`. Each pair is listed once, in the order the values first appear. The search
+    runs on `backend` ("serial", "threads" or "processes", see `parallel_map()`). Worker
+    processes are only started if "processes" is requested, which requires the calling
+    script to guard its entry point with `if __name__ == "__main__":` on platforms that
+    spawn processes.
+
+    """
+
+    unique_values = list(df[column].dropna().unique())  # drop null values
+    pairs = __similar_pairs(
+        unique_values, threshold, backend=backend, max_workers=max_workers
+    )
+    return [
+        [unique_values[i], unique_values[j], similarity] for i, j, similarity in pairs
+    ]
+
+
+def __load_clusters(filename):
     """
+    Load a cluster index, mapping each canonical value to its variants.
+    """
+    if not Path(filename).exists():
+        return {}
+    with open(filename, "r", encoding="utf-8") as file:
+        return json.load(file)["clusters"]
 
-    df = df.dropna(subset=[column])  # drop null values
-    unique_values = df[column].unique()
 
-    completed_pairs = []
-    similar_pairs = []
-    for value in unique_values:
-        for compare_value in [
-            v for v in unique_values if v != value and (value, v) not in completed_pairs
-        ]:
-            similarity = SequenceMatcher(
-                None, value.lower(), compare_value.lower()
-            ).ratio()
-            if similarity > 0.85:
-                similar_pairs.append([value, compare_value, similarity])
+def __save_clusters(clusters, filename, threshold):
+    """
+    Save a cluster index, replacing the previous one at once.
+    """
+    filename = Path(filename)
+    filename.parent.mkdir(parents=True, exist_ok=True)
+    temporary = filename.with_name(f"{filename.name}.{os.getpid()}.partial")
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump({"threshold": threshold, "clusters": clusters}, file, indent=2)
+    os.replace(temporary, filename)
+
+
+def cluster_values(df, column, filename=None, threshold=0.85):
+    """
+    Group the spellings of the values of a text column, such as "affiliation" or
+    "contributorname", into clusters with a canonical value.
+
+    The clusters are kept in a JSON file mapping each canonical value to its variants.
+    Only values that are not in the file yet are compared, with the canonical values
+    and with each other, so updating the clusters daily costs time proportional to the
+    number of new values. A new value joins the cluster of the most similar canonical
+    value if their `difflib.SequenceMatcher` ratio, ignoring case, is above `threshold`,
+    like in `__get_similar_columns`, and else becomes the canonical value of a new
+    cluster. The canonical values never change.
+
+    Parameters:
+    -----------
+    df : pandas DataFrame
+        The inventory.
+    column : str
+        The column whose values are clustered.
+    filename : str or None
+        The file holding the clusters. Defaults to "clusters-<column>.json" in
+        CACHE_DIRECTORY.
+    threshold : float
+        The similarity above which a value is a variant of a canonical value.
 
-            completed_pairs.append((compare_value, value))
+    Returns:
+    --------
+    dict
+        The canonical value of every known value, including the canonical values
+        themselves, e.g. to use with `df[column].map()`.
+    """
+    filename = filename or Path(CACHE_DIRECTORY) / f"clusters-{column}.json"
+    clusters = __load_clusters(filename)
+    mapping = {
+        variant: canonical
+        for canonical, variants in clusters.items()
+        for variant in [canonical, *variants]
+    }
+
+    new_values = [
+        value for value in df[column].dropna().unique() if value not in mapping
+    ]
+    if not new_values:
+        return mapping
+
+    values = list(clusters) + new_values
+    queries = list(range(len(clusters), len(values)))
+    matches = defaultdict(list)
+    for i, j, similarity in __similar_pairs(values, threshold, queries):
+        matches[j].append((-similarity, i))
+
+    for j in queries:
+        # the most similar canonical value, whether it is old or a new value
+        canonical = next(
+            (values[i] for _, i in sorted(matches[j]) if values[i] in clusters),
+            None,
+        )
+        if canonical is None:
+            clusters[values[j]] = []
+            mapping[values[j]] = values[j]
+        else:
+            clusters[canonical].append(values[j])
+            mapping[values[j]] = canonical
 
-    return similar_pairs
+    __save_clusters(clusters, filename, threshold)
+    return mapping
 
 
 def __get__percentage_of_metadata_version_2(df):
@@ -1321,18 +4294,707 @@ def __get__percentage_of_metadata_version_2(df):
     return len(df[df["metadata_version"] == 2]) / len(df)
 
 
-def report():
+class Report:
+    """
+    A report summarizing data statistics for an inventory, computed on demand.
+
+    The fields of the report are the metrics registered with `register_metric()`. Every
+    field is computed the first time it is accessed and memoized. Fields are derived from
+    per-column aggregates, which are memoized as well, so each column is factorized or
+    summarized at most once no matter how many fields use it (e.g. the project counts feed
+    both "number_of_project" and "projects_treemap").
+
+    Fields are accessed as attributes (`report.number_of_datasets`) or like the keys of a
+    dictionary (`report["number_of_datasets"]`). `to_dict()` computes all of them
+    concurrently, see `compute()`. Fields whose columns are missing from the inventory
+    are skipped and listed in `skipped`. The time and memory spent in every stage are
+    recorded in `timings`, see `timing_table()`.
+
+    Parameters:
+    -----------
+    df : pandas DataFrame, LazyInventory or None
+        The inventory to report on. If None, today's inventory is loaded with
+        `today(lazy=True)` the first time a field needs it, so only the columns used by
+        the accessed fields are read.
+    tdate : datetime.date or None
+        The date of the report. Defaults to today.
+    canonical_names : dict, str, pathlib.Path or None
+        The canonical names of the variants of column values, or a JSON file holding
+        them. Values are counted under their canonical names, see `canonicalize()`.
+        Defaults to CANONICAL_NAMES, pass {} to count the values as they are.
+    """
+
+    def __init__(self, df=None, tdate=None, canonical_names=None):
+        self._df = df
+        if canonical_names is None:
+            canonical_names = CANONICAL_NAMES
+        self.canonical_names = load_canonical_names(canonical_names)
+        self._rows = None
+        self._counts = {}
+        self._numeric = {}
+        self._values = {}
+        # True if the report is derived from a saved aggregate state, not a DataFrame
+        self._state = False
+        self.skipped = {}
+        self.timings = []
+        self.date = (tdate or date.today()).strftime("%Y%m%d")
+
+    @property
+    def df(self):
+        """
+        The inventory, loaded on first access if it was not given.
+        """
+        if self._df is None:
+            self._df = today(lazy=True, timings=self.timings)
+        return self._df
+
+    def counts(self, column):
+        """
+        Count the occurrences of each unique value in a column.
+
+        The values are mapped to integer codes once (categoricals already are) and the
+        codes are counted with `numpy.bincount`. Columns with canonical names are
+        remapped first. The result is memoized.
+
+        Parameters:
+        -----------
+        column : str
+            The column to count. Missing values are not counted.
+
+        Returns:
+        --------
+        pandas Series
+            The number of occurrences of each value, in descending order.
+        """
+        if column not in self._counts:
+            series = self.df[column]
+            if self.canonical_names.get(column):
+                frame = series.to_frame()
+                series = canonicalize(frame, self.canonical_names)[column]
+            codes, uniques = pd.factorize(series)
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            index = pd.Index(np.asarray(uniques, dtype=object), dtype=object)
+            counts = pd.Series(counts, index=index, name=column)
+            self._counts[column] = counts.sort_values(ascending=False, kind="stable")
+        return self._counts[column]
+
+    def numeric(self, column):
+        """
+        Compute the count, sum, sum of squares, minimum and maximum of a numeric column.
+
+        The result is memoized.
+
+        Parameters:
+        -----------
+        column : str
+            The column to summarize. Missing values are ignored.
+
+        Returns:
+        --------
+        dict
+            A dictionary with the keys "count", "sum", "sumsq", "min" and "max". "min"
+            and "max" are None if there are no values.
+        """
+        if column not in self._numeric:
+            values = pd.to_numeric(self.df[column], errors="coerce")
+            values = values.to_numpy(dtype="float64")
+            values = values[~np.isnan(values)]
+            self._numeric[column] = {
+                "count": len(values),
+                "sum": float(values.sum()),
+                "sumsq": float(np.square(values).sum()),
+                "min": float(values.min()) if len(values) else None,
+                "max": float(values.max()) if len(values) else None,
+            }
+        return self._numeric[column]
+
+    def _available(self, column, numeric=False):
+        """
+        Check whether an aggregate of a column can be computed.
+        """
+        if column in (self._numeric if numeric else self._counts):
+            return True
+        if self._state:
+            return False
+        return column in self.df
+
+    @property
+    def rows(self):
+        """
+        The number of datasets in the inventory.
+        """
+        if self._rows is None:
+            self._rows = len(self.df)
+        return self._rows
+
+    def aggregates(self):
+        """
+        Compute the aggregate state every field of the report is derived from.
+
+        Returns:
+        --------
+        dict
+            A dictionary with the number of rows ("rows"), the value counts of each column in
+            `REPORT_COUNTED_COLUMNS` ("counts") and the summary of each column in
+            `REPORT_NUMERIC_COLUMNS` ("numeric"). Columns missing from the inventory are left out.
+        """
+        columns = [
+            column for column in REPORT_COUNTED_COLUMNS if self._available(column)
+        ]
+        numeric = [
+            column
+            for column in REPORT_NUMERIC_COLUMNS
+            if self._available(column, numeric=True)
+        ]
+        return {
+            "rows": self.rows,
+            "counts": {column: self.counts(column) for column in columns},
+            "numeric": {column: self.numeric(column) for column in numeric},
+        }
+
+    def save(self, filename):
+        """
+        Save the aggregate state of the report as JSON, e.g. for `Report.load()`.
+
+        Parameters:
+        -----------
+        filename : str or pathlib.Path
+            The file to write.
+        """
+        state = self.aggregates()
+        state["date"] = self.date
+        state["canonical_names"] = self.canonical_names
+        state["counts"] = {
+            column: [list(pair) for pair in zip(counts.index.tolist(), counts.tolist())]
+            for column, counts in state["counts"].items()
+        }
+        Path(filename).write_text(json.dumps(state, default=str))
+
+    @classmethod
+    def load(cls, filename, tdate=None):
+        """
+        Create a report from an aggregate state saved with `Report.save()`.
+
+        Parameters:
+        -----------
+        filename : str or pathlib.Path
+            The file to read.
+        tdate : datetime.date or None
+            The date of the report. Defaults to today.
+
+        Returns:
+        --------
+        Report
+            A report whose fields are derived from the saved state alone.
+        """
+        state = json.loads(Path(filename).read_text())
+        report = cls(tdate=tdate, canonical_names=state.get("canonical_names"))
+        report._state = True
+        report._rows = state["rows"]
+        report._numeric = state["numeric"]
+        for column, pairs in state["counts"].items():
+            values = [value for value, count in pairs]
+            counts = [count for value, count in pairs]
+            report._counts[column] = pd.Series(
+                counts, index=pd.Index(values, dtype=object), name=column, dtype="int64"
+            )
+        return report
+
+    def update(
+        self, added=None, removed=None, changed=None, tdate=None, canonical_names=None
+    ):
+        """
+        Create the report of an inventory that differs from this one by a few rows.
+
+        Counts, sums and sums of squares are updated with the aggregates of the added and
+        removed rows only, so the cost is proportional to the number of rows that changed,
+        not to the size of the inventory.
+
+        Parameters:
+        -----------
+        added : pandas DataFrame or None
+            The rows added to the inventory.
+        removed : pandas DataFrame or None
+            The rows removed from the inventory.
+        changed : tuple or None
+            A pair of DataFrames holding the changed rows before and after the change.
+        tdate : datetime.date or None
+            The date of the new report. Defaults to today.
+        canonical_names : dict, str, pathlib.Path or None
+            The canonical names of the new report, see `canonicalize()`. The counts of
+            this report are remapped to them. Defaults to the names of this report.
+
+        Returns:
+        --------
+        Report
+            A report whose fields are derived from the updated state.
+
+        Note:
+        -----
+        The minimum and maximum of a numeric column cannot be updated when a row holding
+        one of them is removed. They are set to None in that case.
+        """
+        additions = [frame for frame in (added,) if frame is not None]
+        removals = [frame for frame in (removed,) if frame is not None]
+        if changed is not None:
+            removals.append(changed[0])
+            additions.append(changed[1])
+
+        state = self.aggregates()
+        names = self.canonical_names
+        if canonical_names is not None:
+            names = load_canonical_names(canonical_names)
+        deltas = [(Report(frame, canonical_names=names), 1) for frame in additions]
+        deltas += [(Report(frame, canonical_names=names), -1) for frame in removals]
+
+        report = Report(tdate=tdate, canonical_names=names)
+        report._state = True
+        report._rows = state["rows"] + sum(sign * delta.rows for delta, sign in deltas)
+
+        for column, counts in state["counts"].items():
+            if names.get(column) and names != self.canonical_names:
+                values = pd.DataFrame({column: counts.index})
+                values = canonicalize(values, {column: names[column]})[column]
+                counts = counts.groupby(values.astype(object).to_numpy()).sum()
+            for delta, sign in deltas:
+                if column in delta.df:
+                    counts = counts.add(sign * delta.counts(column), fill_value=0)
+            counts = counts[counts > 0].astype("int64")
+            report._counts[column] = counts.sort_values(ascending=False, kind="stable")
+
+        for column, summary in state["numeric"].items():
+            summary = dict(summary)
+            for delta, sign in deltas:
+                if column not in delta.df:
+                    continue
+                change = delta.numeric(column)
+                for key in ("count", "sum", "sumsq"):
+                    summary[key] += sign * change[key]
+                if change["count"] == 0:
+                    continue
+                if sign > 0:
+                    if summary["min"] is not None:
+                        summary["min"] = min(summary["min"], change["min"])
+                    if summary["max"] is not None:
+                        summary["max"] = max(summary["max"], change["max"])
+                else:
+                    if summary["min"] is not None and change["min"] <= summary["min"]:
+                        summary["min"] = None
+                    if summary["max"] is not None and change["max"] >= summary["max"]:
+                        summary["max"] = None
+            report._numeric[column] = summary
+
+        return report
+
+    def __getattr__(self, name):
+        if name in METRICS:
+            try:
+                return self[name]
+            except KeyError as error:
+                # skipped metrics are missing attributes, for getattr() and hasattr()
+                raise AttributeError(error.args[0]) from None
+        raise AttributeError(name)
+
+    def __getitem__(self, name):
+        if name not in self._values:
+            self.compute([name], max_workers=1)
+        if name in self.skipped:
+            raise KeyError(f"{name}: {self.skipped[name]}")
+        return self._values[name]
+
+    def __contains__(self, name):
+        return name in METRICS
+
+    def __iter__(self):
+        return iter(METRICS)
+
+    def keys(self):
+        return list(METRICS)
+
+    def _evaluate(self, name):
+        with measure(f"metric:{name}", self.timings):
+            return METRICS[name]["function"](self)
+
+    def _count(self, column):
+        with measure(f"counts:{column}", self.timings):
+            return self.counts(column)
+
+    def _summarize(self, column):
+        with measure(f"numeric:{column}", self.timings):
+            return self.numeric(column)
+
+    def compute(self, names=None, max_workers=None):
+        """
+        Compute metrics of the report, running independent ones concurrently.
+
+        The requested metrics and the metrics they depend on are resolved from the
+        registry. Metrics whose columns are missing from the inventory, or which depend on
+        such metrics, are skipped and recorded in `Report.skipped`. The remaining metrics
+        run on a thread pool: first every column they need is aggregated once, then the
+        metrics run in dependency order, each batch of metrics whose dependencies are
+        computed running concurrently. Metrics registered with `threadsafe=False` run one
+        at a time.
+
+        Parameters:
+        -----------
+        names : list or None
+            The metrics to compute, or None to compute all registered metrics.
+        max_workers : int or None
+            The number of threads. Defaults to MAX_WORKERS.
+
+        Returns:
+        --------
+        dict
+            The values of the requested metrics that were not skipped.
+
+        Raises:
+        -------
+        KeyError
+            If a metric is not registered.
+        ValueError
+            If metrics depend on each other in a cycle.
+        """
+        names = list(METRICS) if names is None else list(names)
+
+        order = []
+
+        def visit(name, path):
+            if name not in METRICS:
+                raise KeyError(name)
+            if name in path:
+                raise ValueError(f"Error: Circular dependency between metrics {path}")
+            if name in order:
+                return
+            for dependency in METRICS[name]["depends"]:
+                visit(dependency, path + [name])
+            order.append(name)
+
+        for name in names:
+            visit(name, [])
+
+        pending = []
+        for name in order:
+            if name in self._values or name in self.skipped:
+                continue
+            metric = METRICS[name]
+            missing = [
+                column for column in metric["columns"] if not self._available(column)
+            ]
+            missing += [
+                column
+                for column in metric["numeric"]
+                if not self._available(column, numeric=True)
+            ]
+            failed = [
+                dependency
+                for dependency in metric["depends"]
+                if dependency in self.skipped
+            ]
+            if missing:
+                self.skipped[name] = f"missing columns {missing}"
+            elif failed:
+                self.skipped[name] = f"missing metrics {failed}"
+            else:
+                pending.append(name)
+
+        with ThreadPoolExecutor(max_workers or MAX_WORKERS) as executor:
+            # aggregate each column once, before any metric reads it
+            metrics = [METRICS[name] for name in pending]
+            columns = {column for metric in metrics for column in metric["columns"]}
+            numeric = {column for metric in metrics for column in metric["numeric"]}
+            columns = sorted(columns - set(self._counts))
+            numeric = sorted(numeric - set(self._numeric))
+            list(executor.map(self._count, columns))
+            list(executor.map(self._summarize, numeric))
+
+            while pending:
+                ready = [
+                    name
+                    for name in pending
+                    if all(
+                        dependency in self._values
+                        for dependency in METRICS[name]["depends"]
+                    )
+                ]
+                concurrent = [name for name in ready if METRICS[name]["threadsafe"]]
+                values = executor.map(self._evaluate, concurrent)
+                for name, value in zip(concurrent, values):
+                    self._values[name] = value
+                for name in ready:
+                    if not METRICS[name]["threadsafe"]:
+                        self._values[name] = self._evaluate(name)
+                pending = [name for name in pending if name not in ready]
+
+        return {name: self._values[name] for name in names if name in self._values}
+
+    def to_dict(self, max_workers=None):
+        """
+        Compute every metric of the report.
+
+        Parameters:
+        -----------
+        max_workers : int or None
+            The number of threads, see `Report.compute()`.
+
+        Returns:
+        --------
+        dict
+            A dictionary containing the report with all of its data statistics. Metrics
+            skipped because their columns are missing are left out.
+        """
+        return self.compute(max_workers=max_workers)
+
+    def timing_table(self):
+        """
+        Get the wall time, CPU time and memory use of every stage run for the report.
+
+        Stages are loading the inventory ("today.*", see `today()`), aggregating a column
+        ("counts:<column>", "numeric:<column>") and computing a metric ("metric:<name>").
+
+        Returns:
+        --------
+        pandas DataFrame
+            One row per stage, in the order they finished, see `measure()`.
+        """
+        return pd.DataFrame(
+            self.timings,
+            columns=[
+                "stage",
+                "wall_seconds",
+                "cpu_seconds",
+                "peak_traced_bytes",
+                "max_rss_bytes",
+                "rss_growth_bytes",
+            ],
+        )
+
+    def write_timings(self, filename, format=None):
+        """
+        Export the timing table, e.g. to alert on regressions of the daily job.
+
+        Parameters:
+        -----------
+        filename : str or pathlib.Path
+            The file to write.
+        format : str or None
+            Either "json" or "prometheus" (the Prometheus text exposition format, e.g. for
+            the node exporter's textfile collector). Defaults to "json" if the file name
+            ends with ".json" and to "prometheus" otherwise.
+        """
+        filename = Path(filename)
+        if format is None:
+            format = "json" if filename.suffix == ".json" else "prometheus"
+
+        table = self.timing_table()
+        if format == "json":
+            filename.write_text(table.to_json(orient="records"))
+            return
+        if format != "prometheus":
+            raise ValueError(f"Error: Unsupported format {format}")
+
+        lines = []
+        for column, description in [
+            ("wall_seconds", "Wall time of a stage of the report."),
+            ("cpu_seconds", "CPU time of a stage of the report."),
+            ("peak_traced_bytes", "Peak memory allocated by a stage of the report."),
+            (
+                "max_rss_bytes",
+                "Peak resident set size of the process since it started, at the end of "
+                "a stage of the report.",
+            ),
+            (
+                "rss_growth_bytes",
+                "Growth of the peak resident set size during a stage of the report.",
+            ),
+        ]:
+            metric = f"braininventory_stage_{column}"
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} gauge")
+            for stage, value in zip(table["stage"], table[column]):
+                if value is not None and not pd.isna(value):
+                    lines.append(f'{metric}{{stage="{stage}"}} {value}')
+        filename.write_text("\n".join(lines) + "\n")
+
+
+def register_metric(name, columns=(), numeric=(), depends=(), threadsafe=True):
+    """
+    Register a function computing a metric of the report.
+
+    Metrics are computed by `Report.compute()` in the order they are registered, subject
+    to their dependencies. The function receives the `Report` and reads its inputs from
+    it with `Report.counts()`, `Report.numeric()` and `report[dependency]`.
+
+    Parameters:
+    -----------
+    name : str
+        The name of the metric, i.e. its key in the report.
+    columns : list
+        The columns whose value counts the metric uses.
+    numeric : list
+        The numeric columns whose summaries the metric uses.
+    depends : list
+        The metrics the metric uses.
+    threadsafe : bool
+        Whether the metric can run concurrently with other metrics. Metrics that draw on
+        the global matplotlib state are not.
+
+    Returns:
+    --------
+    function
+        A decorator registering the function it is applied to.
+
+    Example:
+        >>> @register_metric("number_of_species", columns=["species"])
+        ... def number_of_species(report):
+        ...     return len(report.counts("species"))
+    """
+
+    def decorator(function):
+        METRICS[name] = {
+            "function": function,
+            "columns": list(columns),
+            "numeric": list(numeric),
+            "depends": list(depends),
+            "threadsafe": threadsafe,
+        }
+        return function
+
+    return decorator
+
+
+def __register_value_counts(name, column):
+    """
+    Register a metric holding the value counts of a column as a dictionary.
+    """
+    register_metric(name, columns=[column])(
+        lambda report: report.counts(column).to_dict()
+    )
+
+
+@register_metric("date")
+def __report_date(report):
+    return report.date
+
+
+@register_metric("number_of_datasets")
+def __report_number_of_datasets(report):
+    return report.rows
+
+
+@register_metric("number_of_project", columns=["project"])
+def __report_number_of_project(report):
+    # datasets without a project count as one more project, as they always have
+    counts = report.counts("project")
+    return len(counts) + int(counts.sum() < report.rows)
+
+
+@register_metric(
+    "completeness_score", numeric=["score"], depends=["number_of_datasets"]
+)
+def __report_completeness_score(report):
+    return report.numeric("score")["sum"] / report["number_of_datasets"]
+
+
+__register_value_counts("metadata_version", "metadata_version")
+__register_value_counts("contributor", "contributorname")
+__register_value_counts("affiliation", "affiliation")
+__register_value_counts("award_number", "award_number")
+__register_value_counts("species", "species")
+__register_value_counts("ncbitaxonomy", "ncbitaxonomy")
+__register_value_counts("samplelocalid", "samplelocalid")
+__register_value_counts("genotype", "genotype")
+__register_value_counts("generalmodality", "generalmodality")
+__register_value_counts("technique", "technique")
+__register_value_counts("locations", "locations")
+
+
+@register_metric(
+    "percentage_of_version_1",
+    columns=["metadata_version"],
+    depends=["number_of_datasets"],
+)
+def __report_percentage_of_version_1(report):
+    return report.counts("metadata_version").get(1, 0) / report["number_of_datasets"]
+
+
+@register_metric("projects_treemap", columns=["project"])
+def __report_projects_treemap(report):
+    return create_projects_treemap(report.counts("project"))
+
+
+def diff_inventories(previous, current, key="URL"):
+    """
+    Find the rows added, removed and changed between two inventories.
+
+    Parameters:
+    -----------
+    previous : pandas DataFrame
+        The earlier inventory.
+    current : pandas DataFrame
+        The later inventory.
+    key : str
+        The column identifying a dataset in both inventories.
+
+    Returns:
+    --------
+    tuple
+        The added rows, the removed rows and a pair holding the changed rows before and
+        after the change, as expected by `Report.update()`.
+
+    Raises:
+    -------
+    ValueError
+        If the key of a dataset appears more than once in an inventory.
+    """
+    for name, inventory in (("previous", previous), ("current", current)):
+        duplicated = inventory[key][inventory[key].duplicated()]
+        if len(duplicated):
+            raise ValueError(
+                f"Error: {len(duplicated)} duplicate values of {key} in the {name} "
+                f"inventory, e.g. {duplicated.iloc[0]}"
+            )
+
+    columns = list(previous.columns)
+    current = current.reindex(columns=columns)
+    previous_hashes = pd.Series(
+        pd.util.hash_pandas_object(previous, index=False).to_numpy(),
+        index=previous[key].to_numpy(),
+    )
+    current_hashes = pd.Series(
+        pd.util.hash_pandas_object(current, index=False).to_numpy(),
+        index=current[key].to_numpy(),
+    )
+
+    added = current[~current[key].isin(previous_hashes.index)]
+    removed = previous[~previous[key].isin(current_hashes.index)]
+
+    common = previous_hashes.index.intersection(current_hashes.index)
+    differs = previous_hashes[common].to_numpy() != current_hashes[common].to_numpy()
+    keys = common[differs]
+    changed = (previous[previous[key].isin(keys)], current[current[key].isin(keys)])
+
+    return added, removed, changed
+
+
+def report(
+    df=None,
+    previous=None,
+    added=None,
+    removed=None,
+    changed=None,
+    canonical_names=None,
+):
     """
     Generate a report summarizing data statistics for today's datasets.
 
     This function generates a report summarizing various data statistics for today's datasets.
-    It retrieves today's date, collects data information for today using the `today()` function,
-    and computes various statistics related to the datasets. The statistics include the number
-    of datasets, number of unique projects, completeness score, metadata versions count,
-    contributor count, affiliation count, award numbers count, species count, NCBI taxonomy count,
-    sample local ID count, genotype count, general modality count, technique count, location count,
-    and the percentage of datasets with metadata version 1. Additionally, it creates a treemap
-    visualization for project counts.
+    The statistics include the number of datasets, number of unique projects, completeness
+    score, metadata versions count, contributor count, affiliation count, award numbers count,
+    species count, NCBI taxonomy count, sample local ID count, genotype count, general modality
+    count, technique count, location count, and the percentage of datasets with metadata
+    version 1. Additionally, it creates a treemap visualization for project counts.
+
+    The parameters are those of `lazy_report()`.
 
     Returns:
     --------
@@ -1341,74 +5003,84 @@ def report():
 
     Note:
     -----
-    The function generates a report summarizing data statistics for today's datasets. It collects
-    the required data using various helper functions and creates a dictionary containing the
-    computed statistics. The report includes information on the number of datasets, number of unique
-    projects, completeness score, metadata versions count, contributor count, affiliation count,
-    award numbers count, species count, NCBI taxonomy count, sample local ID count, genotype count,
-    general modality count, technique count, location count, and the percentage of datasets with
-    metadata version 1. The treemap visualization for project counts is also generated as part of the
-    report.
-    """
-    # Get today's date
-    tdate = date.today()
-
-    # Convert date to string
-    tdate = tdate.strftime("%Y%m%d")
-
-    # Get today's data info
-    df = today()
-
-    # Build report
-    report = {}
-    report["date"] = tdate
-    report["number_of_datasets"] = __get_number_of_datasets(df)
-    report["number_of_project"] = __get_number_of_projects(df)
-    report["completeness_score"] = __get_completeness_score(df)
-    report["metadata_version"] = __get_metadata_version(df)
-    report["contributor"] = __get_contributors(df)
-    report["affiliation"] = __get_affilation(df)
-    report["award_number"] = __get_award_number(df)
-    report["species"] = __get_species(df)
-    report["ncbitaxonomy"] = __get_ncbitaxonomy(df)
-    report["samplelocalid"] = __get_samplelocalid(df)
-    report["genotype"] = __get_genotype(df)
-    report["generalmodality"] = __get_generalmodality(df)
-    report["technique"] = __get_technique(df)
-    report["locations"] = __get_locations(df)
-    report["percentage_of_version_1"] = __get__percentage_of_metadata_version_1(df)
-    # report["is_reachable"] = df["URL"].apply(__is_reachable)
-
-    # plots
-    get_projects_treemap(df)
-
-    return report
+    All the fields are computed, see `Report.to_dict()`. To only compute some of them, use
+    `lazy_report()`.
+    """
+    return lazy_report(
+        df, previous, added, removed, changed, canonical_names=canonical_names
+    ).to_dict()
+
+
+def lazy_report(
+    df=None,
+    previous=None,
+    added=None,
+    removed=None,
+    changed=None,
+    canonical_names=None,
+):
+    """
+    Get a report summarizing data statistics for today's datasets, computed on demand.
 
-def create_general_modality_plot(df):
-  # Creates a segmented bar graph that shows the proportion of general modalities over the years. 
-  # Dropped the null values (no creation dates)
-  df[~df['creation_date'].isnull()]
-  df['dates'] = pd.to_datetime(df['creation_date'])
-  df['year'] = df['dates'].dt.year
-  df = df.dropna(subset=['year'])
-  df['year'] = df['year'].astype(int)
-  grouped = df.groupby(df['dates'].dt.year)
+    Parameters:
+    -----------
+    df : pandas DataFrame or None
+        The inventory to report on. Defaults to today's inventory, see `today()`.
+    previous : Report, str or None
+        A previous report, or the file its state was saved to with `Report.save()`. If given,
+        the report is updated incrementally from it with the `added`, `removed` and `changed`
+        rows instead of being computed from `df`, see `Report.update()`.
+    added : pandas DataFrame or None
+        The rows added since the previous report.
+    removed : pandas DataFrame or None
+        The rows removed since the previous report.
+    changed : tuple or None
+        A pair of DataFrames holding the rows changed since the previous report, before and
+        after the change. See `diff_inventories()`.
+    canonical_names : dict, str, pathlib.Path or None
+        The canonical names of the variants of column values, or a JSON file holding them,
+        see `canonicalize()`. Defaults to CANONICAL_NAMES, or to the names of the previous
+        report for an incremental update.
+
+    Returns:
+    --------
+    Report
+        The report. Its fields are computed when they are first accessed, and
+        `Report.to_dict()` computes all of them, including the treemap.
+
+    Note:
+    -----
+    Nothing is loaded or computed until a field is accessed. Accessing a field only reads
+    the columns it needs, and each column is counted once for all the fields that use it.
+    """
+    if previous is None:
+        return Report(df, canonical_names=canonical_names)
+
+    if not isinstance(previous, Report):
+        previous = Report.load(previous)
+    return previous.update(added, removed, changed, canonical_names=canonical_names)
 
-  import matplotlib.pyplot as plt
 
-  grouped = df.groupby(['year', 'generalmodality']).size().reset_index(name='count')
+def create_general_modality_plot(df):
+    """
+    Create a segmented bar graph that shows the proportion of general modalities over the years.
 
-  pivot_df = grouped.pivot(index='year', columns='generalmodality', values='count').fillna(0)
+    Datasets without a valid creation date are left out.
 
-  pivot_df.plot(kind='bar', stacked=True)
+    Parameters:
+    -----------
+    df : pandas DataFrame
+        The inventory, with the columns "creation_date" and "generalmodality".
 
-  plt.title('General Modalities')
-  plt.ylabel('Number of Datasets')
-  plt.xlabel('Year')
-  plt.xticks(rotation=45)
-  plt.tight_layout()
+    Returns:
+    --------
+    str
+        The name of the file the graph is saved as, "general-modality-by-year-YYYYMMDD.png".
+    """
+    filename = f'general-modality-by-year-{date.today().strftime("%Y%m%d")}.png'
+    __render_modality_by_year(date_rollup(df, "generalmodality", "year"), [filename])
+    return filename
 
-  plt.show()
 
 def create_tree_map(frequency_dict, width, height):
     """
@@ -1417,6 +5089,8 @@ def create_tree_map(frequency_dict, width, height):
     Input parameter: dictionary
     Output:  treemap image
     """
+    import plotly.graph_objects as go
+
     labels = list(frequency_dict.keys())
     values = list(frequency_dict.values())
 
@@ -1444,7 +5118,8 @@ def __get_dates(df):
 
     Output: dictionary
     """
-    df['date'] = pd.to_datetime(df['creation_date'], format='%a %b %d %H:%M:%S %Y')
-    df['year_month'] = df['date'].dt.strftime('%B %Y')
-    grouped_data = df['year_month'].value_counts().to_dict()
-    return grouped_data
\ No newline at end of file
+    counts = date_rollup(df, frequency="month").sort_values(
+        ascending=False, kind="stable"
+    )
+    labels = [f"{calendar.month_name[key % 100]} {key // 100}" for key in counts.index]
+    return dict(zip(labels, counts.tolist()))
@@ -15,17 +15,19 @@ setuptools.setup(
     packages=setuptools.find_packages(),
     install_requires=[
         "squarify",
-        "pandarallel",
         "humanize",
-        "geoip2",
         "seaborn",
         "matplotlib",
         "folium",
+        "geopy",
+        "pyarrow",
+        "aiohttp",
     ],
+    extras_require={"zstd": ["zstandard"]},
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: GNU General Public License v3 (GPLv3)",
         "Operating System :: OS Independent",
     ],
-    python_requires=">=3.6",
+    python_requires=">=3.8",
 )
@@ -0,0 +1,184 @@
+"""
+Test the HTTP paths of braininventory against a local web server.
+"""
+
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from braininventory import get
+
+INVENTORY = [
+    {"project": "Project 001", "generalmodality": "MRI", "score": 0.5},
+    {"project": "Project 002", "generalmodality": "other", "score": 1.0},
+]
+ETAG = '"inventory-1"'
+COMPRESSED = {"/reports/today.json.gz": gzip.compress(json.dumps(INVENTORY).encode())}
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+else:
+    COMPRESSED["/reports/today.json.zst"] = zstandard.ZstdCompressor().compress(
+        json.dumps(INVENTORY).encode()
+    )
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    Serve "/reports/today.json" with an ETag, answering conditional requests, its
+    compressed variants and the datasets "/data/ok" and "/data/nohead", which does not
+    support HEAD.
+    """
+
+    def do_HEAD(self):
+        self.server.requests.append(("HEAD", self.path, dict(self.headers)))
+        if self.path == "/data/ok":
+            self.send_response(200)
+        elif self.path == "/data/nohead":
+            self.send_response(405)
+        else:
+            self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        self.server.requests.append(("GET", self.path, dict(self.headers)))
+        if self.path == "/data/nohead" and self.headers.get("Range") == "bytes=0-0":
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes 0-0/100")
+            self.send_header("Content-Length", "1")
+            self.end_headers()
+            self.wfile.write(b"x")
+            return
+
+        if self.path == "/reports/today.json":
+            if self.headers.get("If-None-Match") == ETAG:
+                self.send_response(304)
+                self.send_header("ETag", ETAG)
+                self.end_headers()
+                return
+            body = json.dumps(INVENTORY).encode("utf-8")
+            self.send_response(200)
+            self.send_header("ETag", ETAG)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if self.path in COMPRESSED:
+            body = COMPRESSED[self.path]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *arguments):
+        pass
+
+
+@pytest.fixture
+def server():
+    """
+    Run the local web server in a thread and get its URL.
+    """
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_today_fetches_inventory(server, tmp_path):
+    httpd, url = server
+    df = get.today(
+        directory=tmp_path / "missing",
+        server=f"{url}/reports/",
+        cache_directory=tmp_path / "cache",
+    )
+
+    assert len(df) == len(INVENTORY)
+    assert list(df["project"]) == ["Project 001", "Project 002"]
+    method, path, headers = httpd.requests[-1]
+    assert "If-None-Match" not in headers
+
+
+def test_today_reads_unmodified_inventory_from_cache(server, tmp_path):
+    httpd, url = server
+    options = {
+        "directory": tmp_path / "missing",
+        "server": f"{url}/reports/",
+        "cache_directory": tmp_path / "cache",
+    }
+    first = get.today(**options)
+    second = get.today(**options)
+
+    assert len(httpd.requests) == 2
+    method, path, headers = httpd.requests[-1]
+    assert headers["If-None-Match"] == ETAG
+    assert second.equals(first)
+
+
+def test_today_without_cache_sends_no_validators(server, tmp_path):
+    httpd, url = server
+    options = {"directory": tmp_path / "missing", "server": f"{url}/reports/"}
+    get.today(cache_directory=tmp_path / "cache", **options)
+    df = get.today(cache=False, **options)
+
+    assert len(df) == len(INVENTORY)
+    method, path, headers = httpd.requests[-1]
+    assert "If-None-Match" not in headers
+
+
+@pytest.mark.parametrize(
+    "compression",
+    [
+        "gzip",
+        pytest.param(
+            "zstd",
+            marks=pytest.mark.skipif(zstandard is None, reason="requires zstandard"),
+        ),
+    ],
+)
+def test_today_decompresses_inventory(server, tmp_path, compression):
+    httpd, url = server
+    df = get.today(
+        directory=tmp_path / "missing",
+        server=f"{url}/reports/",
+        compression=compression,
+        cache=False,
+    )
+
+    assert df.to_dict("records") == INVENTORY
+    method, path, headers = httpd.requests[-1]
+    assert path == f"/reports/today.json{get.COMPRESSION_SUFFIXES[compression]}"
+
+
+@pytest.mark.parametrize("backend", ["async", "threads", "serial"])
+def test_check_reachability(server, backend):
+    httpd, url = server
+    urls = [f"{url}/data/ok", f"{url}/data/nohead", f"{url}/data/missing"]
+    results = get.check_reachability(urls, retries=0, backend=backend)
+
+    assert results["url"].tolist() == urls
+    assert results["status"].tolist() == [200, 206, 404]
+    assert results["reachable"].tolist() == [True, True, False]
+    # the dataset without HEAD support is checked with a GET of its first byte
+    ranged = [
+        (method, headers.get("Range"))
+        for method, path, headers in httpd.requests
+        if path == "/data/nohead"
+    ]
+    assert ranged == [("HEAD", None), ("GET", "bytes=0-0")]